@@ -0,0 +1,249 @@
+"""Headless analytics engine behind the dashboard.
+
+``compute_dashboard(source, spec)`` takes a filter spec and returns every
+number and chart table the page shows, computed from one filter of the
+source (a ``cube.Cube`` or a ``backends.DuckDBBackend``) with each roll-up
+done once and shared between the charts and the insight cards. app.py only
+renders the result, so the same figures can be profiled, cached or produced
+by a batch job without Streamlit.
+
+By default the view's fused ``rollups()`` produces every aggregate in one
+pass; ``fused=False`` issues one query per widget instead.
+``compute_trend(source, spec, granularity)`` gives the sales trend by day,
+ISO week, month or hour of day, ``compute_customers(source, spec)`` the
+customer analytics (RFM segments, cohorts, repeat rate) and
+``compute_delivery(source, spec)`` the delivery-partner performance.
+
+Usage:
+    python analytics.py --state Maharashtra --category Jeans
+    python analytics.py --trace chrome > rerun.json    # per-stage timings
+    python analytics.py --granularity week             # the weekly trend
+"""
+import argparse
+import json
+import math
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+import cube
+import customers
+import delivery
+import fact
+import ingest
+import revenue
+import timebuckets
+import tracing
+
+TOP_N = 10
+CHARTS = ["state_sales", "mode_sales", "product_sales", "return_reasons", "monthly_sales",
+          "revenue_waterfall"]
+
+# Month filter value no "YYYY-MM" (or "NaT") label equals: selects nothing.
+NO_MONTH = "none"
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """Sidebar selection; empty means "all". Months are "YYYY-MM", inclusive."""
+    states: tuple = ()
+    cities: tuple = ()
+    categories: tuple = ()
+    start_month: str = None
+    end_month: str = None
+
+    def normalised(self):
+        """Same selection with sorted, de-duplicated values, usable as a cache key."""
+        return FilterSpec(tuple(sorted(set(self.states))), tuple(sorted(set(self.cities))),
+                          tuple(sorted(set(self.categories))), self.start_month, self.end_month)
+
+    def months(self, available):
+        """Months of `available` inside the range, or None when the range is open.
+
+        A range holding none of them (reversed, or outside the data) gives
+        [NO_MONTH], so it selects nothing rather than everything.
+        """
+        if self.start_month is None and self.end_month is None:
+            return None
+        start, end = self.start_month or "", self.end_month or "9999-99"
+        months = [m for m in available if m != "NaT" and start <= m <= end]
+        # An empty list would mean "no filter".
+        return months or [NO_MONTH]
+
+
+@dataclass
+class DashboardResult:
+    kpis: dict
+    state_sales: pd.DataFrame     # State, Total: top states, ascending for a bar chart
+    mode_sales: pd.DataFrame      # Transaction_Mode, Total
+    product_sales: pd.DataFrame   # P_Name, Total: top products, ascending
+    return_reasons: pd.DataFrame  # Reason, Count, descending
+    monthly_sales: pd.DataFrame   # Month, Total
+    revenue_waterfall: pd.DataFrame  # Step, Amount, Measure: gross to net
+    insights: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        """Plain JSON-serialisable form."""
+        out = {"kpis": plain(self.kpis)}
+        for key in CHARTS:
+            out[key] = records(getattr(self, key))
+        out["insights"] = plain(self.insights)
+        return out
+
+
+def _plain(value):
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def plain(mapping):
+    """`mapping` with numpy scalars as Python values and NaN as None."""
+    return {k: _plain(v) for k, v in mapping.items()}
+
+
+def records(df):
+    """Rows of `df` as ``plain`` dicts."""
+    return [plain(row) for row in df.to_dict("records")]
+
+
+def _rollups(view):
+    """The fused aggregates, computed one widget at a time."""
+    out = {"kpis": view.kpis(), "product_sales": view.product_sales(),
+           "reason_counts": view.reason_counts(), "revenue": view.revenue_totals()}
+    for dim in ["State", "Transaction_Mode", "Month"]:
+        out[dim] = view.sales_by(dim)
+    return out
+
+
+def _rows(table):
+    cells = getattr(table, "cells", None)  # the DuckDB backend has no frames to count
+    return len(cells) if cells is not None else None
+
+
+def _selection(source, spec):
+    months = spec.months(source.options("Month"))
+    return list(spec.states), list(spec.cities), list(spec.categories), months
+
+
+def approximate_counts(source, spec, sketches):
+    """Total Orders and Active Customers for `spec` estimated from `sketches`."""
+    selection = _selection(source, spec)
+    return {"total_orders": sketches.count("Or_ID", *selection),
+            "total_customers": sketches.count("C_ID", *selection)}
+
+
+def compute_trend(source, spec=FilterSpec(), granularity="month"):
+    """Revenue per `granularity` bucket (a key of ``timebuckets.GRANULARITIES``)
+    as a (bucket, Total) frame; days, weeks and hours without sales are zero."""
+    sales = source.filter(*_selection(source, spec)).sales_over(granularity)
+    label = timebuckets.GRANULARITIES[granularity][1]
+    if granularity in ("day", "week") and len(sales):
+        sales = sales.reindex(pd.date_range(sales.index.min(), sales.index.max(),
+                                            freq="D" if granularity == "day" else "W-MON"),
+                              fill_value=0)
+    elif granularity == "hour":
+        sales = sales.reindex(range(24), fill_value=0)
+    return sales.rename_axis(label).rename("Total").reset_index()
+
+
+def compute_customers(source, spec=FilterSpec()):
+    """RFM segments, cohorts and repeat purchases (``customers.CustomerResult``)
+    for `spec`, from the cube's per-customer table."""
+    return customers.analyse(source.filter(*_selection(source, spec)).customer_rows())
+
+
+def compute_delivery(source, spec=FilterSpec()):
+    """Partner volume, delivery ratings, returns and cost (``delivery.DeliveryResult``)
+    for `spec`, from the cube's per-partner table."""
+    return delivery.analyse(source.filter(*_selection(source, spec)).partner_rows())
+
+
+def compute_dashboard(source, spec=FilterSpec(), sketches=None, fused=True,
+                      trace=tracing.NULL_TRACE):
+    """Every KPI, chart table and insight for `spec`.
+
+    With `sketches` (anything with ``count(column, states, cities, categories,
+    months)``), Total Orders and Active Customers are approximate. Each stage
+    is recorded on `trace`.
+    """
+    selection = _selection(source, spec)
+    with trace.stage("filter", rows_in=_rows(source)) as span:
+        view = source.filter(*selection)
+        span.rows_out = _rows(view)
+    with trace.stage("rollups" if fused else "per_widget_aggregates", rows_in=_rows(view)):
+        rollups = view.rollups() if fused else _rollups(view)
+
+    kpis = dict(rollups["kpis"])
+    if sketches is not None:
+        with trace.stage("sketch_counts"):
+            kpis.update(approximate_counts(source, spec, sketches))
+
+    state_totals = rollups["State"]
+    mode_totals = rollups["Transaction_Mode"]
+    reason_totals = rollups["reason_counts"]
+    total_sales = kpis["total_sales"]
+
+    with trace.stage("chart_tables"):
+        insights = {
+            "top_state": state_totals.idxmax() if len(state_totals) > 0 else "N/A",
+            "top_state_sales": state_totals.max() if len(state_totals) > 0 else 0,
+            "top_payment": mode_totals.idxmax() if len(mode_totals) > 0 else "N/A",
+            "payment_pct": mode_totals.max() / total_sales * 100 if total_sales > 0 else 0,
+            "top_return": reason_totals.idxmax() if len(reason_totals) > 0 else "N/A",
+        }
+        return DashboardResult(
+            kpis=kpis,
+            state_sales=state_totals.sort_values(ascending=True).tail(TOP_N).reset_index(),
+            mode_sales=mode_totals.reset_index(),
+            product_sales=(rollups["product_sales"].sort_values(ascending=True).tail(TOP_N)
+                           .reset_index()),
+            return_reasons=reason_totals.sort_values(ascending=False).reset_index(name="Count"),
+            monthly_sales=rollups["Month"].reset_index(),
+            revenue_waterfall=revenue.waterfall(rollups["revenue"]),
+            insights=insights,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the dashboard numbers as JSON.")
+    parser.add_argument("--data-dir", default=str(ingest.DATA_DIR))
+    parser.add_argument("--state", action="append", default=[])
+    parser.add_argument("--city", action="append", default=[])
+    parser.add_argument("--category", action="append", default=[])
+    parser.add_argument("--start-month")
+    parser.add_argument("--end-month")
+    parser.add_argument("--granularity", choices=list(timebuckets.GRANULARITIES),
+                        help="print the sales trend at this granularity instead")
+    parser.add_argument("--trace", choices=["jsonl", "chrome"],
+                        help="print per-stage timings instead of the result")
+    args = parser.parse_args()
+
+    trace = tracing.Trace("cli")
+    with trace.stage("load") as span:
+        tables = ingest.load_tables(args.data_dir)
+        span.rows_out = len(tables["orders"])
+    with trace.stage("merge", rows_in=len(tables["orders"])) as span:
+        fact_table = fact.build_fact_table(tables)
+        span.rows_out = len(fact_table)
+    with trace.stage("cube", rows_in=len(fact_table)) as span:
+        source = cube.build_cube(fact_table)
+        span.rows_out = len(source.cells)
+    spec = FilterSpec(tuple(args.state), tuple(args.city), tuple(args.category),
+                      args.start_month, args.end_month)
+    if args.granularity:
+        print(compute_trend(source, spec, args.granularity).to_string(index=False))
+        return
+    result = compute_dashboard(source, spec, trace=trace)
+    if args.trace == "chrome":
+        print(trace.to_chrome())
+    elif args.trace == "jsonl":
+        print(trace.to_jsonl(), end="")
+    else:
+        print(json.dumps(result.to_dict(), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
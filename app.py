@@ -1,8 +1,22 @@
+import os
+from datetime import datetime
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
+
+import analytics
+import backends
+import charts
+import customers
+import forecast
+import incremental
+import refresher
+import result_cache
+import shared
+import sketch
+import streaming
+import timebuckets
+import tracing
 
 # -----------------------------------------
 # Page Configuration
@@ -314,95 +328,189 @@ st.markdown(custom_css, unsafe_allow_html=True)
 # -----------------------------------------
 # Load Data
 # -----------------------------------------
-@st.cache_data
-def load_data():
-    customers = pd.read_csv("data/customer.csv")
-    delivery = pd.read_csv("data/delivery.csv")
-    orders = pd.read_csv("data/orders.csv")
-    products = pd.read_csv("data/products.csv")
-    ratings = pd.read_csv("data/ratings.csv")
-    returns = pd.read_csv("data/returns.csv")
-    transactions = pd.read_csv("data/transaction.csv")
-    return customers, delivery, orders, products, ratings, returns, transactions
-
-customers, delivery, orders, products, ratings, returns, transactions = load_data()
-
-# Merge Datasets
-orders_full = (orders.merge(customers, on="C_ID", how="left")
-               .merge(products, on="P_ID", how="left")
-               .merge(ratings, on="Or_ID", how="left")
-               .merge(returns, on="Or_ID", how="left")
-               .merge(transactions, on="Or_ID", how="left")
-               .merge(delivery, on="DP_ID", how="left"))
-
-orders_full["Total"] = orders_full["Qty"] * orders_full["Price"]
-orders_full["Order_Date"] = pd.to_datetime(orders_full["Order_Date"], errors="coerce")
-
-# Store original data for insights
-orders_original = orders_full.copy()
+# AJIO_STREAMING=1 builds the cube out of core, partition by partition, for
+# order volumes that do not fit in memory; the fact table is never held.
+STREAMING = os.environ.get("AJIO_STREAMING") == "1"
+CHUNK_ROWS = int(os.environ.get("AJIO_CHUNK_ROWS", streaming.DEFAULT_CHUNK_ROWS))
+# AJIO_BACKEND=duckdb answers the same queries as SQL against one embedded
+# DuckDB database per process; "pandas" (the default) is the reference.
+BACKEND = os.environ.get("AJIO_BACKEND", "pandas")
+CACHE_BACKEND = "streaming" if STREAMING else BACKEND
+# AJIO_SHARED_DIR makes this process a worker of a multi-process deployment:
+# it attaches the cube `python shared.py publish` maps into shared memory
+# instead of loading its own copy.
+SHARED_DIR = os.environ.get("AJIO_SHARED_DIR")
+REFRESH_SECONDS = float(os.environ.get("AJIO_REFRESH_SECONDS", refresher.DEFAULT_INTERVAL))
+# Reruns slower than this are logged with their filters; AJIO_TRACE_FILE
+# appends every rerun's stage timings there as JSON lines.
+SLOW_RERUN_MS = float(os.environ.get("AJIO_SLOW_RERUN_MS", tracing.DEFAULT_SLOW_MS))
+TRACE_FILE = os.environ.get("AJIO_TRACE_FILE")
+
+# One data source per process, shared by every session. The default loader
+# builds the fact table and the cube once from the typed Feather snapshot (or
+# the CSVs) and afterwards folds rows appended to the order feeds into the
+# cube by delta. A background thread watches data/ and swaps in each new
+# snapshot when it is ready, so reruns never wait on a reload: they render
+# whichever snapshot is current when they start.
+@st.cache_resource(show_spinner="Loading data...")
+def get_source():
+    if SHARED_DIR:
+        source = shared.SharedSource(SHARED_DIR)
+    elif BACKEND == "duckdb":
+        source = refresher.VersionedBuilder(backends.DuckDBBackend)
+    elif STREAMING:
+        source = refresher.VersionedBuilder(lambda: streaming.build_cube(chunk_rows=CHUNK_ROWS))
+    else:
+        source = incremental.IncrementalLoader()
+    return source, refresher.BackgroundRefresher(source, REFRESH_SECONDS).start()
 
-# -----------------------------------------
-# Sidebar Filters
-# -----------------------------------------
-with st.sidebar:
-    st.markdown("## 🎛️ Dashboard Controls")
-    st.markdown("---")
 
-    st.markdown("### 📍 Location Filters")
-    states = st.multiselect(
-        "Select State(s)",
-        options=sorted(orders_full["State"].dropna().unique()),
-        placeholder="All States"
-    )
+@st.cache_resource(max_entries=1, show_spinner="Building distinct-count sketches...")
+def build_streaming_sketches(version):
+    return streaming.build_sketches(chunk_rows=CHUNK_ROWS)
 
-    cities = st.multiselect(
-        "Select City(s)",
-        options=sorted(orders_full["City"].dropna().unique()),
-        placeholder="All Cities"
-    )
 
-    st.markdown("---")
-    st.markdown("### 📦 Product Filters")
-    categories = st.multiselect(
-        "Select Category",
-        options=sorted(orders_full["Category"].dropna().unique()),
-        placeholder="All Categories"
-    )
+# Keyed by version, so a session pinned to the previous snapshot after a
+# refresh keeps counting that snapshot's orders, not the new one's.
+@st.cache_resource(max_entries=2, show_spinner="Building distinct-count sketches...")
+def snapshot_sketches(version, _source, _snapshot):
+    return _source.sketches(_snapshot)
 
-    st.markdown("---")
-    st.markdown("### ℹ️ About")
-    st.info("This dashboard provides comprehensive analytics for AJIO e-commerce sales data.")
 
-# Apply Filters
-if states:
-    orders_full = orders_full[orders_full["State"].isin(states)]
-if cities:
-    orders_full = orders_full[orders_full["City"].isin(cities)]
-if categories:
-    orders_full = orders_full[orders_full["Category"].isin(categories)]
+@st.cache_resource(max_entries=1)
+def attach_shared_sketches(version):
+    return shared.attach_sketches(version, SHARED_DIR)
+
+
+# Built figures are shared too, keyed by the chart's table, so an unchanged
+# aggregate is not turned into a figure again on every rerun.
+@st.cache_resource
+def get_figure_cache():
+    return charts.FigureCache()
+
+
+# Results are shared by every session in the process: the first session to ask
+# for a selection computes it, the rest read it back. AJIO_RESULT_CACHE_DIR
+# adds an on-disk tier so a restart does not start cold.
+@st.cache_resource
+def get_result_cache():
+    return result_cache.ResultCache(disk_dir=os.environ.get("AJIO_RESULT_CACHE_DIR"))
+
+
+# A forecast takes a model fit of a second or more, so each one is fitted once
+# per data version, selection and granularity and kept in a small cache of its
+# own, where it cannot push dashboard results out (on disk too: a directory
+# holds one cache).
+@st.cache_resource
+def get_forecast_cache():
+    disk_dir = os.environ.get("AJIO_RESULT_CACHE_DIR")
+    return result_cache.ResultCache(max_entries=forecast.CACHE_ENTRIES,
+                                    disk_dir=disk_dir and os.path.join(disk_dir, "forecasts"))
+
+
+def get_sketches(source, snapshot):
+    """Distinct-count sketches for `snapshot`, or None if there are none."""
+    if SHARED_DIR:
+        return attach_shared_sketches(snapshot.version)  # None if published without them
+    if BACKEND == "duckdb":
+        return snapshot.value  # approx_count_distinct, DuckDB's own HyperLogLog
+    if STREAMING:
+        return build_streaming_sketches(snapshot.version)
+    return snapshot_sketches(snapshot.version, source, snapshot)
+
+
+def snapshot_cube(snapshot):
+    return snapshot.value if isinstance(snapshot, refresher.Versioned) else snapshot.cube
+
+
+def finish_trace(trace, spec):
+    """Log a slow fragment run, export it and keep it for the Performance panel."""
+    trace.finish().check_slow(SLOW_RERUN_MS, spec)
+    if TRACE_FILE:
+        with open(TRACE_FILE, "a") as f:
+            f.write(trace.to_jsonl())
+    st.session_state.setdefault("traces", {})[trace.label] = trace
+
+
+# The page is split into fragments so an interaction reruns only the part of
+# the script that reads it. Changing a filter reruns the dashboard fragment
+# (page setup, CSS and the data source are not touched); the approximate-
+# counts toggle reruns only the KPI cards, the trend controls only the trend
+# chart and the timings toggle only the Performance panel. Each section
+# declares the inputs it reads and is handed nothing else, so a new
+# dependency has to be added here first.
+SECTIONS = {
+    "header": ("data",),
+    "kpis": ("data", "filters", "approx"),
+    "charts": ("data", "filters"),
+    "trend": ("data", "filters", "granularity", "show_forecast"),
+    "insights": ("data", "filters"),
+    "customers": ("data", "filters"),
+    "delivery": ("data", "filters"),
+    "performance": ("traces",),
+}
+
+
+def render(name, fn, trace=tracing.NULL_TRACE, **inputs):
+    """Run section `name` with only the inputs it declared in SECTIONS."""
+    with trace.stage(name):
+        fn(trace, **{key: inputs[key] for key in SECTIONS[name]})
+
+
+def dashboard_result(data, filters, trace):
+    # Every widget is a slice or roll-up of the cube, never a scan of the fact
+    # table, and the result is shared through the result cache, so sections
+    # asking for the same (data, filters) reuse one computation.
+    key = result_cache.make_key(data.version, filters, CACHE_BACKEND)
+    return get_result_cache().get_or_compute(
+        key, lambda: analytics.compute_dashboard(snapshot_cube(data), filters, trace=trace))
+
+
+def plot(trace, name, df):
+    with trace.stage(f"figure:{name}", rows_in=len(df)):
+        fig = get_figure_cache().figure(name, df)
+    with trace.stage(f"render:{name}"):
+        st.plotly_chart(fig, use_container_width=True)
+
 
 # -----------------------------------------
 # HEADER SECTION
 # -----------------------------------------
-st.markdown(f"""
+def header_section(trace, data):
+    freshness = get_source()[1].status(data.version)
+    last_updated = (f"{datetime.fromtimestamp(data.built_at).strftime('%B %d, %Y %H:%M')} "
+                    f"· data {data.version} · checked {freshness['checked_seconds_ago']:.0f}s ago")
+    if freshness["pending"]:
+        last_updated += " · ⏳ loading newer data"
+    elif freshness["error"]:
+        last_updated += " · ⚠️ refresh failed, showing last good data"
+    st.markdown(f"""
 <div class="dashboard-header">
     <h1>🛒 AJIO Sales Analytics Dashboard</h1>
     <p>Real-time insights into sales performance, customer behavior, and business metrics</p>
-    <span class="header-badge">📅 Last Updated: {datetime.now().strftime('%B %d, %Y')}</span>
+    <span class="header-badge">📅 Last Updated: {last_updated}</span>
 </div>
 """, unsafe_allow_html=True)
 
+
 # -----------------------------------------
 # KPI METRICS SECTION
 # -----------------------------------------
-total_sales = orders_full["Total"].sum()
-total_orders = orders_full["Or_ID"].nunique()
-total_customers = orders_full["C_ID"].nunique()
-avg_order_value = total_sales / total_orders if total_orders > 0 else 0
-return_rate = (orders_full["Reason"].notna().sum() / len(orders_full) * 100) if len(orders_full) > 0 else 0
-avg_rating = orders_full["Prod_Rating"].mean() if "Prod_Rating" in orders_full.columns else 0
-
-st.markdown(f"""
+def kpi_cards(trace, data, filters, approx):
+    kpis = dict(dashboard_result(data, filters, trace).kpis)
+    sketches = get_sketches(get_source()[0], data) if approx else None
+    if sketches is not None:
+        with trace.stage("sketch_counts"):
+            kpis.update(analytics.approximate_counts(snapshot_cube(data), filters, sketches))
+    total_sales = kpis["total_sales"]
+    net_revenue = kpis["net_revenue"]
+    total_orders = kpis["total_orders"]
+    total_customers = kpis["total_customers"]
+    avg_order_value = kpis["avg_order_value"]
+    return_rate = kpis["return_rate"]
+    avg_rating = kpis["avg_rating"]
+
+    st.markdown(f"""
 <div class="kpi-container">
     <div class="kpi-card">
         <div class="kpi-icon">💰</div>
@@ -410,6 +518,11 @@ st.markdown(f"""
         <div class="kpi-label">Total Revenue</div>
         <span class="kpi-change positive">↑ Active</span>
     </div>
+    <div class="kpi-card">
+        <div class="kpi-icon">💵</div>
+        <div class="kpi-value">₹{net_revenue/1e6:.1f}M</div>
+        <div class="kpi-label">Net Revenue</div>
+    </div>
     <div class="kpi-card">
         <div class="kpi-icon">📦</div>
         <div class="kpi-value">{total_orders:,}</div>
@@ -441,202 +554,458 @@ st.markdown(f"""
 </div>
 """, unsafe_allow_html=True)
 
-st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
-
-# -----------------------------------------
-# CHARTS ROW 1: Sales by State & Transaction Mode
-# -----------------------------------------
-col1, col2 = st.columns(2)
 
-with col1:
+# The approximate-counts toggle only changes two KPI cards, so it reruns this
+# fragment alone; the toggle itself is drawn into the sidebar slot it is given.
+@st.fragment
+def kpi_section(data, filters, toggle_slot):
+    trace = tracing.Trace("kpis")
+    with toggle_slot:
+        approx = st.toggle(
+            "Approximate distinct counts",
+            value=False,
+            help=f"Estimate Total Orders and Active Customers from HyperLogLog sketches "
+                 f"(±{sketch.DEFAULT_ERROR:.0%} standard error) instead of exact counts."
+        )
+    render("kpis", kpi_cards, trace, data=data, filters=filters, approx=approx)
+    finish_trace(trace, filters)
+
+
+def chart_sections(trace, data, filters):
+    result = dashboard_result(data, filters, trace)
+
+    # -----------------------------------------
+    # CHARTS ROW 1: Sales by State & Transaction Mode
+    # -----------------------------------------
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown('<div class="chart-title"><span class="icon">📍</span> Total Sales by State</div>', unsafe_allow_html=True)
+        plot(trace, "state_sales", result.state_sales)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col2:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown('<div class="chart-title"><span class="icon">💳</span> Revenue by Payment Mode</div>', unsafe_allow_html=True)
+        plot(trace, "mode_sales", result.mode_sales)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    # -----------------------------------------
+    # CHARTS ROW 2: Top Products & Return Reasons
+    # -----------------------------------------
+    col3, col4 = st.columns(2)
+
+    with col3:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown('<div class="chart-title"><span class="icon">🏆</span> Top 10 Products by Sales</div>', unsafe_allow_html=True)
+        plot(trace, "product_sales", result.product_sales)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col4:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown('<div class="chart-title"><span class="icon">🔄</span> Return Reasons Analysis</div>', unsafe_allow_html=True)
+        if len(result.return_reasons) > 0:
+            plot(trace, "return_reasons", result.return_reasons)
+        else:
+            st.info("No return data available for selected filters.")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    # -----------------------------------------
+    # CHARTS ROW 3: Gross to Net Revenue
+    # -----------------------------------------
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-    st.markdown('<div class="chart-title"><span class="icon">📍</span> Total Sales by State</div>', unsafe_allow_html=True)
-
-    state_sales = orders_full.groupby("State")["Total"].sum().sort_values(ascending=True).tail(10).reset_index()
-
-    fig = px.bar(
-        state_sales,
-        x="Total",
-        y="State",
-        orientation="h",
-        color="Total",
-        color_continuous_scale=["#1e3a5f", "#00d4ff"],
-    )
-    fig.update_layout(
-        plot_bgcolor="rgba(0,0,0,0)",
-        paper_bgcolor="rgba(0,0,0,0)",
-        font=dict(color="#a0a0a0"),
-        showlegend=False,
-        coloraxis_showscale=False,
-        margin=dict(l=0, r=0, t=10, b=0),
-        height=350,
-        xaxis=dict(gridcolor="#2a2a2a", title="Revenue (₹)"),
-        yaxis=dict(gridcolor="#2a2a2a", title="")
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    st.markdown('<div class="chart-title"><span class="icon">💸</span> Revenue Waterfall</div>', unsafe_allow_html=True)
+    plot(trace, "revenue_waterfall", result.revenue_waterfall)
+    st.caption("Discounts are the coupon's percent of the gross; approved returns are refunded "
+               "in the month of the return, so a month filter shows that month's refunds.")
     st.markdown('</div>', unsafe_allow_html=True)
 
-with col2:
-    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-    st.markdown('<div class="chart-title"><span class="icon">💳</span> Revenue by Payment Mode</div>', unsafe_allow_html=True)
-
-    mode_amt = orders_full.groupby("Transaction_Mode")["Total"].sum().reset_index()
-
-    fig = px.pie(
-        mode_amt,
-        names="Transaction_Mode",
-        values="Total",
-        hole=0.55,
-        color_discrete_sequence=["#00d4ff", "#7c3aed", "#10b981", "#f59e0b", "#ef4444"]
-    )
-    fig.update_layout(
-        plot_bgcolor="rgba(0,0,0,0)",
-        paper_bgcolor="rgba(0,0,0,0)",
-        font=dict(color="#a0a0a0"),
-        margin=dict(l=0, r=0, t=10, b=0),
-        height=350,
-        legend=dict(orientation="h", yanchor="bottom", y=-0.2)
-    )
-    fig.update_traces(textposition='inside', textinfo='percent+label')
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
+
 
 # -----------------------------------------
-# CHARTS ROW 2: Top Products & Return Reasons
+# SALES TREND
 # -----------------------------------------
-col3, col4 = st.columns(2)
-
-with col3:
-    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-    st.markdown('<div class="chart-title"><span class="icon">🏆</span> Top 10 Products by Sales</div>', unsafe_allow_html=True)
-
-    prod_sales = orders_full.groupby("P_Name")["Total"].sum().sort_values(ascending=True).tail(10).reset_index()
-
-    fig = px.bar(
-        prod_sales,
-        x="Total",
-        y="P_Name",
-        orientation="h",
-        color="Total",
-        color_continuous_scale=["#10b981", "#00d4ff"],
-    )
-    fig.update_layout(
-        plot_bgcolor="rgba(0,0,0,0)",
-        paper_bgcolor="rgba(0,0,0,0)",
-        font=dict(color="#a0a0a0"),
-        showlegend=False,
-        coloraxis_showscale=False,
-        margin=dict(l=0, r=0, t=10, b=0),
-        height=350,
-        xaxis=dict(gridcolor="#2a2a2a", title="Revenue (₹)"),
-        yaxis=dict(gridcolor="#2a2a2a", title="")
-    )
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
-
-with col4:
+def trend_chart(trace, data, filters, granularity, show_forecast):
+    key = result_cache.make_key(data.version, filters, CACHE_BACKEND, view=granularity)
+    with trace.stage("trend"):
+        trend = get_result_cache().get_or_compute(
+            key, lambda: analytics.compute_trend(snapshot_cube(data), filters, granularity))
+    if show_forecast:
+        key = result_cache.make_key(data.version, filters, CACHE_BACKEND,
+                                    view=f"forecast:{granularity}")
+        with trace.stage("forecast"), st.spinner("Fitting forecast..."):
+            future = get_forecast_cache().get_or_compute(
+                key, lambda: forecast.forecast(trend, granularity))
+        if len(future):
+            trend = pd.concat([trend, future], ignore_index=True)
+        else:
+            st.caption(f"Not enough history for a forecast "
+                       f"(at least {forecast.MIN_HISTORY} periods are needed).")
+    plot(trace, "sales_trend", trend)
+
+
+# The granularity and forecast controls rerun only this fragment.
+@st.fragment
+def trend_section(data, filters):
+    trace = tracing.Trace("trend")
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-    st.markdown('<div class="chart-title"><span class="icon">🔄</span> Return Reasons Analysis</div>', unsafe_allow_html=True)
-
-    return_data = orders_full[orders_full["Reason"].notna()]
-    if len(return_data) > 0:
-        return_reason = return_data["Reason"].value_counts().reset_index()
-        return_reason.columns = ["Reason", "Count"]
-
-        fig = px.pie(
-            return_reason,
-            names="Reason",
-            values="Count",
-            hole=0.55,
-            color_discrete_sequence=["#ef4444", "#f59e0b", "#7c3aed", "#00d4ff", "#10b981"]
+    st.markdown('<div class="chart-title"><span class="icon">📈</span> Sales Trend</div>', unsafe_allow_html=True)
+    col_granularity, col_forecast = st.columns([3, 1])
+    with col_granularity:
+        granularity = st.radio(
+            "Granularity",
+            options=list(timebuckets.GRANULARITIES),
+            index=list(timebuckets.GRANULARITIES).index("month"),
+            format_func=lambda g: timebuckets.GRANULARITIES[g][1],
+            horizontal=True,
+            label_visibility="collapsed"
         )
-        fig.update_layout(
-            plot_bgcolor="rgba(0,0,0,0)",
-            paper_bgcolor="rgba(0,0,0,0)",
-            font=dict(color="#a0a0a0"),
-            margin=dict(l=0, r=0, t=10, b=0),
-            height=350,
-            legend=dict(orientation="h", yanchor="bottom", y=-0.2)
+    with col_forecast:
+        show_forecast = st.toggle(
+            "Show forecast",
+            value=False,
+            disabled=not forecast.available(granularity),
+            help="Prophet forecast of the next periods with its uncertainty band "
+                 "(days, weeks and months; needs the prophet package)."
         )
-        fig.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("No return data available for selected filters.")
+    render("trend", trend_chart, trace, data=data, filters=filters,
+           granularity=granularity,
+           show_forecast=show_forecast and forecast.available(granularity))
     st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
+    finish_trace(trace, filters)
 
-st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
 
 # -----------------------------------------
-# MONTHLY SALES TREND
+# INSIGHTS SECTION
 # -----------------------------------------
-st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-st.markdown('<div class="chart-title"><span class="icon">📈</span> Monthly Sales Trend</div>', unsafe_allow_html=True)
-
-orders_full["Month"] = orders_full["Order_Date"].dt.to_period("M").astype(str)
-monthly_sales = orders_full.groupby("Month")["Total"].sum().reset_index()
-
-fig = go.Figure()
-fig.add_trace(go.Scatter(
-    x=monthly_sales["Month"],
-    y=monthly_sales["Total"],
-    mode='lines+markers',
-    line=dict(color='#00d4ff', width=3),
-    marker=dict(size=10, color='#00d4ff'),
-    fill='tozeroy',
-    fillcolor='rgba(0, 212, 255, 0.1)'
-))
-fig.update_layout(
-    plot_bgcolor="rgba(0,0,0,0)",
-    paper_bgcolor="rgba(0,0,0,0)",
-    font=dict(color="#a0a0a0"),
-    margin=dict(l=0, r=0, t=10, b=0),
-    height=300,
-    xaxis=dict(gridcolor="#2a2a2a", title="Month"),
-    yaxis=dict(gridcolor="#2a2a2a", title="Revenue (₹)")
-)
-st.plotly_chart(fig, use_container_width=True)
-st.markdown('</div>', unsafe_allow_html=True)
+def insight_cards(trace, data, filters):
+    insights = dashboard_result(data, filters, trace).insights
+    st.markdown("## 💡 Key Business Insights")
+
+    col_ins1, col_ins2, col_ins3 = st.columns(3)
+
+    with col_ins1:
+        top_state = insights["top_state"]
+        top_state_sales = insights["top_state_sales"]
+        st.markdown(f"""
+        <div class="insight-card">
+            <h4>🏆 Top Performing State</h4>
+            <p><span class="insight-value">{top_state}</span> leads with <span class="insight-value">₹{top_state_sales/1e6:.2f}M</span> in total sales, showing strong market presence in this region.</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col_ins2:
+        top_payment = insights["top_payment"]
+        payment_pct = insights["payment_pct"]
+        st.markdown(f"""
+        <div class="insight-card">
+            <h4>💳 Preferred Payment Method</h4>
+            <p><span class="insight-value">{top_payment}</span> accounts for <span class="insight-value">{payment_pct:.1f}%</span> of transactions, indicating customer preference for this payment mode.</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col_ins3:
+        top_return = insights["top_return"]
+        st.markdown(f"""
+        <div class="insight-card">
+            <h4>🔄 Primary Return Reason</h4>
+            <p><span class="insight-value">{top_return}</span> is the most common return reason. Consider improving product quality or descriptions to reduce returns.</p>
+        </div>
+        """, unsafe_allow_html=True)
 
-st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
 
 # -----------------------------------------
-# INSIGHTS SECTION
+# CUSTOMER ANALYTICS
 # -----------------------------------------
-st.markdown("## 💡 Key Business Insights")
+def customer_sections(trace, data, filters):
+    # Rolled up from the cube's per-customer table for the same selection and
+    # cached like the dashboard result, so no order is rescanned here.
+    key = result_cache.make_key(data.version, filters, CACHE_BACKEND, view="customers")
+    with trace.stage("customer_result"):
+        result = get_result_cache().get_or_compute(
+            key, lambda: analytics.compute_customers(snapshot_cube(data), filters))
+    kpis = result.kpis
+    st.markdown("## 👥 Customer Analytics")
+    st.markdown(f"""
+<div class="kpi-container">
+    <div class="kpi-card">
+        <div class="kpi-icon">👥</div>
+        <div class="kpi-value">{kpis['customers']:,}</div>
+        <div class="kpi-label">Customers</div>
+    </div>
+    <div class="kpi-card">
+        <div class="kpi-icon">🔁</div>
+        <div class="kpi-value">{kpis['repeat_rate']:.1f}%</div>
+        <div class="kpi-label">Repeat Purchase Rate</div>
+    </div>
+    <div class="kpi-card">
+        <div class="kpi-icon">📦</div>
+        <div class="kpi-value">{kpis['orders_per_customer']:.2f}</div>
+        <div class="kpi-label">Orders per Customer</div>
+    </div>
+    <div class="kpi-card">
+        <div class="kpi-icon">💰</div>
+        <div class="kpi-value">₹{kpis['revenue_per_customer']:,.0f}</div>
+        <div class="kpi-label">Revenue per Customer</div>
+    </div>
+</div>
+""", unsafe_allow_html=True)
+    if not kpis["customers"]:
+        st.info("No customers for selected filters.")
+        return
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown('<div class="chart-title"><span class="icon">🎯</span> RFM Segments</div>', unsafe_allow_html=True)
+        plot(trace, "customer_segments", result.segments.sort_values("Customers"))
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col2:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown('<div class="chart-title"><span class="icon">📋</span> Segment Profile</div>', unsafe_allow_html=True)
+        st.dataframe(result.segments.round(1), hide_index=True, use_container_width=True,
+                     column_config={"Revenue": st.column_config.NumberColumn(format="₹%d"),
+                                    "Recency": st.column_config.NumberColumn("Recency (days)"),
+                                    "Monetary": st.column_config.NumberColumn(format="₹%d")})
+        top = result.insights["top_segment"]
+        st.markdown(f"""
+        <div class="insight-card">
+            <h4>🏆 Most Valuable Segment</h4>
+            <p><span class="insight-value">{top}</span> customers bring <span class="insight-value">{result.insights['top_segment_share']:.1f}%</span> of the revenue of this selection.</p>
+        </div>
+        """, unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+    st.markdown('<div class="chart-title"><span class="icon">📅</span> Cohort Retention by First Order Month</div>', unsafe_allow_html=True)
+    if len(result.cohorts):
+        plot(trace, "cohort_retention", result.cohorts)
+    else:
+        st.info("No dated orders for selected filters.")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+    st.markdown('<div class="chart-title"><span class="icon">🏅</span> Top 10 Customers by Revenue</div>', unsafe_allow_html=True)
+    top_customers = result.customers.nlargest(10, "Monetary")
+    st.dataframe(top_customers.assign(C_ID=customers.display_ids(top_customers["C_ID"]).to_numpy())
+                 [["C_ID", "Segment", "Recency", "Frequency", "Monetary", "Returns", "Cohort"]],
+                 hide_index=True, use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
 
-col_ins1, col_ins2, col_ins3 = st.columns(3)
 
-with col_ins1:
-    top_state = orders_full.groupby("State")["Total"].sum().idxmax() if len(orders_full) > 0 else "N/A"
-    top_state_sales = orders_full.groupby("State")["Total"].sum().max() if len(orders_full) > 0 else 0
+# -----------------------------------------
+# DELIVERY PARTNERS
+# -----------------------------------------
+def delivery_sections(trace, data, filters):
+    # Rolled up from the cube's per-partner table; the rating histograms are
+    # its stored per-star counts, so no rating is recounted on a filter change.
+    key = result_cache.make_key(data.version, filters, CACHE_BACKEND, view="delivery")
+    with trace.stage("delivery_result"):
+        result = get_result_cache().get_or_compute(
+            key, lambda: analytics.compute_delivery(snapshot_cube(data), filters))
+    kpis = result.kpis
+    st.markdown("## 🚚 Delivery Partners")
     st.markdown(f"""
-    <div class="insight-card">
-        <h4>🏆 Top Performing State</h4>
-        <p><span class="insight-value">{top_state}</span> leads with <span class="insight-value">₹{top_state_sales/1e6:.2f}M</span> in total sales, showing strong market presence in this region.</p>
+<div class="kpi-container">
+    <div class="kpi-card">
+        <div class="kpi-icon">🚚</div>
+        <div class="kpi-value">{kpis['partners']:,}</div>
+        <div class="kpi-label">Delivery Partners</div>
     </div>
-    """, unsafe_allow_html=True)
+    <div class="kpi-card">
+        <div class="kpi-icon">⭐</div>
+        <div class="kpi-value">{kpis['avg_delivery_rating']:.1f}</div>
+        <div class="kpi-label">Avg Delivery Rating</div>
+    </div>
+    <div class="kpi-card">
+        <div class="kpi-icon">⏰</div>
+        <div class="kpi-value">{kpis['late_delivery_rate']:.1f}%</div>
+        <div class="kpi-label">Late Delivery Returns</div>
+    </div>
+    <div class="kpi-card">
+        <div class="kpi-icon">💸</div>
+        <div class="kpi-value">₹{kpis['logistics_cost']/1e6:.1f}M</div>
+        <div class="kpi-label">Logistics Cost ({kpis['cost_rate']:.1f}% of revenue)</div>
+    </div>
+</div>
+""", unsafe_allow_html=True)
+    if not kpis["partners"]:
+        st.info("No deliveries for selected filters.")
+        return
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown('<div class="chart-title"><span class="icon">📦</span> Orders by Delivery Partner</div>', unsafe_allow_html=True)
+        plot(trace, "partner_volume", result.partners.sort_values("Orders"))
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col2:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown('<div class="chart-title"><span class="icon">💰</span> Share of Logistics Cost</div>', unsafe_allow_html=True)
+        plot(trace, "partner_cost", result.partners)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    col3, col4 = st.columns(2)
+
+    with col3:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown('<div class="chart-title"><span class="icon">⭐</span> Delivery Rating Distribution</div>', unsafe_allow_html=True)
+        plot(trace, "delivery_ratings", result.ratings)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col4:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown('<div class="chart-title"><span class="icon">🔄</span> Return Rate by Reason</div>', unsafe_allow_html=True)
+        if len(result.returns.columns) > 1:
+            plot(trace, "partner_returns", result.returns)
+        else:
+            st.info("No return data available for selected filters.")
+        st.markdown('</div>', unsafe_allow_html=True)
 
-with col_ins2:
-    top_payment = orders_full.groupby("Transaction_Mode")["Total"].sum().idxmax() if len(orders_full) > 0 else "N/A"
-    payment_pct = (orders_full.groupby("Transaction_Mode")["Total"].sum().max() / total_sales * 100) if total_sales > 0 else 0
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+    st.markdown('<div class="chart-title"><span class="icon">📋</span> Partner Scorecard</div>', unsafe_allow_html=True)
+    st.dataframe(result.partners.round(1), hide_index=True, use_container_width=True,
+                 column_config={"DP_name": st.column_config.TextColumn("Partner"),
+                                "Volume_Share": st.column_config.NumberColumn("Volume (%)"),
+                                "Revenue": st.column_config.NumberColumn(format="₹%d"),
+                                "Cost": st.column_config.NumberColumn(format="₹%d"),
+                                "Cost_Share": st.column_config.NumberColumn("Cost (%)"),
+                                "Cost_Rate": st.column_config.NumberColumn("Cost / Revenue (%)"),
+                                "Return_Rate": st.column_config.NumberColumn("Returns (%)"),
+                                "Late_Rate": st.column_config.NumberColumn("Late Delivery (%)"),
+                                "Avg_Rating": st.column_config.NumberColumn("Avg Rating")})
+    insights = result.insights
     st.markdown(f"""
     <div class="insight-card">
-        <h4>💳 Preferred Payment Method</h4>
-        <p><span class="insight-value">{top_payment}</span> accounts for <span class="insight-value">{payment_pct:.1f}%</span> of transactions, indicating customer preference for this payment mode.</p>
+        <h4>⏰ Most Late Deliveries</h4>
+        <p><span class="insight-value">{insights['late_partner']}</span> has <span class="insight-value">{insights['late_rate']:.1f}%</span> of its orders returned for late delivery.</p>
     </div>
-    """, unsafe_allow_html=True)
-
-with col_ins3:
-    if orders_full["Reason"].notna().any():
-        top_return = orders_full[orders_full["Reason"].notna()]["Reason"].mode().iloc[0]
-    else:
-        top_return = "N/A"
-    st.markdown(f"""
     <div class="insight-card">
-        <h4>🔄 Primary Return Reason</h4>
-        <p><span class="insight-value">{top_return}</span> is the most common return reason. Consider improving product quality or descriptions to reduce returns.</p>
+        <h4>💸 Highest Logistics Cost</h4>
+        <p><span class="insight-value">{insights['cost_partner']}</span> takes <span class="insight-value">{insights['cost_share']:.1f}%</span> of the logistics cost for <span class="insight-value">{insights['volume_share']:.1f}%</span> of the orders.</p>
     </div>
     """, unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+# -----------------------------------------
+# PERFORMANCE PANEL
+# -----------------------------------------
+def timings_panel(trace, traces):
+    traces = list(traces.values())
+    stages = pd.DataFrame([record for t in traces for record in t.records()],
+                          columns=["trace", "name", "duration_ms", "rows_in", "rows_out",
+                                   "mem_delta_mb"])
+    st.dataframe(stages.round(2), hide_index=True)
+    st.caption(" · ".join(f"{t.label}: {t.total_ms:,.0f} ms" for t in traces))
+    st.download_button("Export JSON lines", "".join(t.to_jsonl() for t in traces),
+                       "rerun-trace.jsonl")
+    st.download_button("Export Chrome trace", tracing.to_chrome(traces), "rerun-trace.json")
+
+
+@st.fragment
+def performance_section(toggle_slot):
+    with toggle_slot:
+        show_timings = st.toggle(
+            "Show stage timings",
+            value=False,
+            help="Wall time, rows and memory change of every stage of the last run of each fragment."
+        )
+        if show_timings:
+            render("performance", timings_panel, traces=st.session_state.get("traces", {}))
+
+
+# -----------------------------------------
+# Sidebar Filters and Dashboard
+# -----------------------------------------
+@st.fragment
+def dashboard():
+    trace = tracing.Trace("dashboard")
+    with trace.stage("source"):
+        source = get_source()[0]
+        data = source.current  # read once: this run sticks to one version
+    sales_cube = snapshot_cube(data)
+
+    with trace.stage("sidebar"), st.sidebar:
+        st.markdown("### 📍 Location Filters")
+        states = st.multiselect(
+            "Select State(s)",
+            options=sales_cube.options("State"),
+            placeholder="All States"
+        )
+
+        cities = st.multiselect(
+            "Select City(s)",
+            options=sales_cube.options("City", State=states),
+            placeholder="All Cities"
+        )
+
+        st.markdown("---")
+        st.markdown("### 📦 Product Filters")
+        categories = st.multiselect(
+            "Select Category",
+            options=sales_cube.options("Category"),
+            placeholder="All Categories"
+        )
+
+        st.markdown("---")
+        st.markdown("### 📅 Date Filter")
+        months = [month for month in sales_cube.options("Month") if month != "NaT"]
+        start_month, end_month = st.select_slider(
+            "Select Month Range",
+            options=months,
+            value=(months[0], months[-1])
+        ) if months else (None, None)
+        if months and (start_month, end_month) == (months[0], months[-1]):
+            start_month = end_month = None  # the whole range: no date filter
+
+        st.markdown("---")
+        st.markdown("### ⚙️ Performance")
+        approx_slot, timings_slot, cache_slot = st.container(), st.container(), st.empty()
+
+    filters = analytics.FilterSpec(tuple(states), tuple(cities), tuple(categories),
+                                   start_month, end_month)
+    with trace.stage("result"):
+        dashboard_result(data, filters, trace)
+
+    render("header", header_section, trace, data=data)
+    kpi_section(data, filters, approx_slot)
+    st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
+    sales_tab, customers_tab, delivery_tab = st.tabs(["📊 Sales", "👥 Customers", "🚚 Delivery"])
+    with sales_tab:
+        render("charts", chart_sections, trace, data=data, filters=filters)
+        trend_section(data, filters)
+        render("insights", insight_cards, trace, data=data, filters=filters)
+    with customers_tab:
+        render("customers", customer_sections, trace, data=data, filters=filters)
+    with delivery_tab:
+        render("delivery", delivery_sections, trace, data=data, filters=filters)
+
+    cache_stats = get_result_cache().stats()
+    cache_slot.caption(f"Result cache: {cache_stats['hits'] + cache_stats['disk_hits']:,} hits, "
+                       f"{cache_stats['misses']:,} misses, {cache_stats['entries']} entries "
+                       f"({cache_stats['mb']:.1f} MB)")
+    finish_trace(trace, filters)
+    performance_section(timings_slot)
+
+
+with st.sidebar:
+    st.markdown("## 🎛️ Dashboard Controls")
+    st.markdown("---")
+
+dashboard()
+
+with st.sidebar:
+    st.markdown("---")
+    st.markdown("### ℹ️ About")
+    st.info("This dashboard provides comprehensive analytics for AJIO e-commerce sales data.")
 
 # -----------------------------------------
 # FOOTER
@@ -646,4 +1015,3 @@ st.markdown("""
     <p>📊 AJIO Sales Analytics Dashboard | Built with Streamlit & Plotly | © 2025</p>
 </div>
 """, unsafe_allow_html=True)
-
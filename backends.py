@@ -0,0 +1,354 @@
+"""Query backends the dashboard can render from.
+
+``pandas`` is the reference implementation: the in-process cube built by
+``incremental.IncrementalLoader``. ``duckdb`` pushes the same aggregates down
+as SQL to an embedded, vectorised, multi-threaded engine: the CSVs are loaded
+and joined once per data version inside one process-wide DuckDB database,
+and every chart is a filtered GROUP BY against it. Sessions share that
+database through per-query cursors instead of each holding its own frames.
+
+Both expose the interface app.py uses on ``cube.Cube``: ``options()``,
+``filter()`` and, on the filtered view, ``kpis()``, ``sales_by()``,
+``sales_over()``, ``product_sales()``, ``reason_counts()``,
+``revenue_totals()``, ``customer_rows()``, ``partner_rows()`` and the fused
+``rollups()``.
+
+Usage:
+    python backends.py --check        # compare duckdb against pandas
+"""
+import argparse
+import math
+import random
+from pathlib import Path
+
+import pandas as pd
+
+import analytics
+import cube
+import customers
+import delivery
+import fact
+import ingest
+import revenue
+import timebuckets
+
+try:
+    import duckdb
+except ImportError:  # the pandas backend needs nothing extra
+    duckdb = None
+
+_SQL_TYPES = {"string": "VARCHAR", "category": "VARCHAR", "int8": "TINYINT", "int16": "SMALLINT",
+              "int32": "INTEGER", "int64": "BIGINT"}
+
+
+def _read_csv_sql(name, data_dir):
+    columns = {col: _SQL_TYPES[dtype] for col, dtype in ingest.DTYPES[name].items()}
+    for col in ingest.DATE_COLUMNS.get(name, []):
+        columns[col] = "DATE"
+    spec = ", ".join(f"'{col}': '{sql_type}'" for col, sql_type in columns.items())
+    path = (Path(data_dir) / ingest.TABLES[name]).as_posix()
+    return f"SELECT * FROM read_csv('{path}', header = true, types = {{{spec}}})"
+
+
+class DuckDBBackend:
+    """The dashboard aggregates over a DuckDB copy of the joined fact table."""
+
+    def __init__(self, data_dir=ingest.DATA_DIR, database=":memory:"):
+        if duckdb is None:
+            raise RuntimeError("the duckdb backend needs the duckdb package")
+        self.con = duckdb.connect(database)
+        for name in ingest.TABLES:
+            self.con.execute(f"CREATE OR REPLACE TABLE {name} AS {_read_csv_sql(name, data_dir)}")
+        # Same left joins as fact.join_orders, against the order feeds collapsed
+        # to one row per order by the same policies as fact.COLLAPSE, and the
+        # same amounts as revenue.add_amounts.
+        self.con.execute("""
+            CREATE OR REPLACE TABLE fact AS
+            WITH joined AS (
+                SELECT o.Or_ID, o.C_ID, c.State, c.City, p.Category, p.P_Name,
+                       o.Qty::BIGINT * p.Price AS Total,
+                       coalesce(strftime(o.Order_Date, '%Y-%m'), 'NaT') AS Month,
+                       date_diff('day', DATE '1970-01-01', o.Order_Date) AS Order_Day,
+                       hour(try_cast(o.Order_Time AS TIME)) AS Order_Hour,
+                       r.Prod_Rating, r.Delivery_Service_Rating, rt.Reason,
+                       t.Transaction_Mode, d.DP_name,
+                       o.Qty::BIGINT * p.Price * coalesce(o.Discount, 0) / 100.0 AS Discounts,
+                       d.Percent_Cut, rt.Return_Refund = 'Approved' AS Refunded, rt.Dates
+                FROM orders o
+                LEFT JOIN customers c USING (C_ID)
+                LEFT JOIN products p USING (P_ID)
+                LEFT JOIN (SELECT Or_ID, avg(Prod_Rating) AS Prod_Rating,
+                                  avg(Delivery_Service_Rating) AS Delivery_Service_Rating
+                           FROM ratings GROUP BY Or_ID) r USING (Or_ID)
+                LEFT JOIN (SELECT Or_ID, Reason, Return_Refund, Dates FROM returns
+                           QUALIFY row_number() OVER (PARTITION BY Or_ID
+                                                      ORDER BY Dates DESC NULLS LAST, rowid DESC) = 1
+                          ) rt USING (Or_ID)
+                LEFT JOIN (SELECT Or_ID, Transaction_Mode FROM transactions
+                           QUALIFY row_number() OVER (PARTITION BY Or_ID ORDER BY rowid DESC) = 1
+                          ) t USING (Or_ID)
+                LEFT JOIN delivery d USING (DP_ID)
+            )
+            SELECT * EXCLUDE (Discounts, Percent_Cut, Refunded, Dates),
+                   Discounts::DOUBLE AS Discounts,
+                   CASE WHEN Refunded THEN Total - Discounts ELSE 0 END::DOUBLE AS Refunds,
+                   ((Total - Discounts) * coalesce(Percent_Cut, 0) / 100.0)::DOUBLE AS Logistics,
+                   CASE WHEN Refunded THEN coalesce(strftime(Dates, '%Y-%m'), 'NaT') END
+                       AS Refund_Month
+            FROM joined
+        """)
+        # revenue.booked: refunds in the month of the return, the rest in the order month.
+        self.con.execute("""
+            CREATE OR REPLACE TABLE revenue AS
+            SELECT State, City, Category, Month, Total::DOUBLE AS Gross, Discounts,
+                   0.0::DOUBLE AS Refunds, Logistics
+            FROM fact
+            UNION ALL
+            SELECT State, City, Category, Refund_Month AS Month, 0.0, 0.0, Refunds, 0.0
+            FROM fact WHERE Refunds > 0
+        """)
+
+    def query(self, sql, params=()):
+        # A cursor is a separate connection to the same database, safe to use
+        # from whichever session thread is rendering.
+        return self.con.cursor().execute(sql, list(params)).df()
+
+    def options(self, dim, **selection):
+        where, params = _where(selection)
+        df = self.query(f"SELECT DISTINCT {dim} FROM fact WHERE {dim} IS NOT NULL AND {where} "
+                        f"ORDER BY {dim}", params)
+        return df[dim].tolist()
+
+    def filter(self, states=None, cities=None, categories=None, months=None):
+        return DuckDBView(self, {"State": states, "City": cities, "Category": categories,
+                                 "Month": months})
+
+    def count(self, column, states=None, cities=None, categories=None, months=None):
+        """Approximate distinct count via DuckDB's HyperLogLog aggregate."""
+        where, params = _where({"State": states, "City": cities, "Category": categories,
+                                "Month": months})
+        return int(self.query(f"SELECT approx_count_distinct({column}) AS n FROM fact "
+                              f"WHERE {where}", params)["n"].iloc[0])
+
+
+def _where(selection):
+    clauses, params = ["TRUE"], []
+    for dim, values in selection.items():
+        if values:
+            clauses.append(f"{dim} = ANY(?)")
+            params.append(list(values))
+    return " AND ".join(clauses), params
+
+
+class DuckDBView:
+    def __init__(self, backend, selection):
+        self.backend = backend
+        self.where, self.params = _where(selection)
+
+    def _series(self, sql, key, value):
+        df = self.backend.query(sql, self.params)
+        return df.set_index(key)[value]
+
+    def kpis(self):
+        row = self.backend.query(f"""
+            SELECT coalesce(sum(Total), 0)::BIGINT AS total_sales,
+                   count(DISTINCT Or_ID) AS total_orders,
+                   count(DISTINCT C_ID) AS total_customers,
+                   count(Reason) AS returns, count(*) AS rows,
+                   avg(Prod_Rating) AS avg_rating
+            FROM fact WHERE {self.where}
+        """, self.params).iloc[0]
+        total_sales, total_orders = row["total_sales"], int(row["total_orders"])
+        return {
+            "total_sales": total_sales,
+            "total_orders": total_orders,
+            "total_customers": int(row["total_customers"]),
+            "avg_order_value": total_sales / total_orders if total_orders > 0 else 0,
+            "return_rate": row["returns"] / row["rows"] * 100 if row["rows"] > 0 else 0,
+            "avg_rating": row["avg_rating"] if pd.notna(row["avg_rating"]) else float("nan"),
+            "net_revenue": self.revenue_totals()["Net"],
+        }
+
+    def sales_by(self, dim):
+        return self._series(f"SELECT {dim}, sum(Total)::BIGINT AS Total FROM fact "
+                            f"WHERE {dim} IS NOT NULL AND {self.where} GROUP BY {dim} ORDER BY {dim}",
+                            dim, "Total")
+
+    def sales_over(self, granularity):
+        """Same as ``cube.Cube.sales_over``."""
+        if granularity == "month":
+            return self.sales_by("Month").drop("NaT", errors="ignore")
+        column = "Order_Hour" if granularity == "hour" else "Order_Day"
+        df = self.backend.query(f"SELECT {column}, sum(Total)::BIGINT AS Total FROM fact "
+                                f"WHERE {column} >= 0 AND {self.where} GROUP BY {column}",
+                                self.params)
+        codes = df[column].to_numpy()
+        if granularity == "week":
+            codes = timebuckets.week_of(codes)
+        sums = df["Total"].groupby(codes).sum()
+        return sums.set_axis(timebuckets.labels(granularity, sums.index).rename(
+            timebuckets.GRANULARITIES[granularity][1]))
+
+    def product_sales(self):
+        return self._series(f"SELECT P_Name, sum(Total)::BIGINT AS Total FROM fact "
+                            f"WHERE P_Name IS NOT NULL AND {self.where} GROUP BY P_Name "
+                            f"ORDER BY P_Name", "P_Name", "Total")
+
+    def reason_counts(self):
+        return self._series(f"SELECT Reason, count(*) AS Count FROM fact "
+                            f"WHERE Reason IS NOT NULL AND {self.where} GROUP BY Reason "
+                            f"ORDER BY Reason", "Reason", "Count")
+
+    def revenue_totals(self):
+        row = self.backend.query(f"""
+            SELECT coalesce(sum(Gross), 0) AS Gross, coalesce(sum(Discounts), 0) AS Discounts,
+                   coalesce(sum(Refunds), 0) AS Refunds, coalesce(sum(Logistics), 0) AS Logistics
+            FROM revenue WHERE {self.where}
+        """, self.params).iloc[0]
+        return pd.Series({**row, "Net": row["Gross"] - row["Discounts"] - row["Refunds"]
+                                        - row["Logistics"]})[revenue.MEASURES]
+
+    def customer_rows(self):
+        return self.backend.query(f"""
+            SELECT Month, C_ID, count(*) AS Rows, sum(Total)::BIGINT AS Total,
+                   count(Reason) AS Returns, min(Order_Day)::DOUBLE AS First_Day,
+                   max(Order_Day)::DOUBLE AS Last_Day
+            FROM fact WHERE {self.where} GROUP BY Month, C_ID
+        """, self.params)
+
+    def partner_rows(self):
+        stars = ", ".join(f"count(*) FILTER (WHERE floor(Delivery_Service_Rating + 0.5) = {star})"
+                          f" AS {col}" for star, col in zip(cube.STARS, cube.STAR_COLUMNS))
+        return self.backend.query(f"""
+            SELECT DP_name, Reason, count(*) AS Rows, sum(Total)::BIGINT AS Total,
+                   sum(Logistics) AS Logistics,
+                   coalesce(sum(Delivery_Service_Rating), 0) AS Stars_Sum, {stars}
+            FROM fact WHERE {self.where} GROUP BY DP_name, Reason
+        """, self.params)
+
+    def rollups(self, dims=("State", "Transaction_Mode", "Month")):
+        """Same as ``cube.Cube.rollups``: every aggregate in one GROUPING SETS scan
+        (and the revenue totals, booked by a different month, in one more)."""
+        keys = list(dims) + ["P_Name", "Reason"]
+        sets = ", ".join(["()"] + [f"({key})" for key in keys])
+        df = self.backend.query(f"""
+            SELECT {", ".join(keys)}, {", ".join(f"grouping({key}) AS g_{key}" for key in keys)},
+                   coalesce(sum(Total), 0)::BIGINT AS Total, count(*) AS Count,
+                   count(Reason) AS returns, sum(Prod_Rating) AS rating_sum,
+                   count(Prod_Rating) AS rating_count,
+                   count(DISTINCT Or_ID) AS orders, count(DISTINCT C_ID) AS customers
+            FROM fact WHERE {self.where}
+            GROUP BY GROUPING SETS ({sets})
+        """, self.params)
+        grand = df[df[[f"g_{key}" for key in keys]].all(axis=1)].iloc[0]
+        total_sales, total_orders = grand["Total"], int(grand["orders"])
+        out = {"kpis": {
+            "total_sales": total_sales,
+            "total_orders": total_orders,
+            "total_customers": int(grand["customers"]),
+            "avg_order_value": total_sales / total_orders if total_orders > 0 else 0,
+            "return_rate": grand["returns"] / grand["Count"] * 100 if grand["Count"] > 0 else 0,
+            "avg_rating": (grand["rating_sum"] / grand["rating_count"]
+                           if grand["rating_count"] > 0 else float("nan")),
+        }}
+        out["revenue"] = self.revenue_totals()
+        out["kpis"]["net_revenue"] = out["revenue"]["Net"]
+
+        def series(key, value):
+            rows = df[(df[f"g_{key}"] == 0) & df[key].notna()].sort_values(key)
+            return rows.set_index(key)[value]
+
+        for dim in dims:
+            out[dim] = series(dim, "Total")
+        out["product_sales"] = series("P_Name", "Total")
+        out["reason_counts"] = series("Reason", "Count")
+        return out
+
+
+def _same_series(a, b):
+    a = a.set_axis(a.index.astype(str)).sort_index()
+    b = b.set_axis(b.index.astype(str)).sort_index()
+    return a.index.equals(b.index) and all(math.isclose(x, y) for x, y in zip(a, b))
+
+
+def check_parity(reference, candidate, trials=50, seed=0):
+    """Compare every dashboard number for random filters; returns mismatches."""
+    rng = random.Random(seed)
+    states, categories = reference.options("State"), reference.options("Category")
+    months = reference.options("Month")
+    mismatches = []
+    for _ in range(trials):
+        sel_states = rng.sample(states, rng.randint(0, 3))
+        cities = reference.options("City", State=sel_states)
+        sel_cities = rng.sample(cities, min(rng.randint(0, 2), len(cities)))
+        sel_categories = rng.sample(categories, rng.randint(0, 2))
+        start = rng.randrange(len(months))
+        sel_months = months[start:start + rng.randint(1, 6)] if rng.random() < 0.5 else None
+        selection = (sel_states, sel_cities, sel_categories, sel_months)
+        a = reference.filter(*selection)
+        b = candidate.filter(*selection)
+        ka, kb = a.kpis(), b.kpis()
+        for key in ka:
+            if not (math.isclose(ka[key], kb[key]) or (math.isnan(ka[key]) and math.isnan(kb[key]))):
+                mismatches.append((*selection, key, ka[key], kb[key]))
+        checks = {f"sales_by({dim})": (a.sales_by(dim), b.sales_by(dim))
+                  for dim in ["State", "Transaction_Mode", "Month"]}
+        checks.update({f"sales_over({g})": (a.sales_over(g), b.sales_over(g))
+                       for g in timebuckets.GRANULARITIES})
+        checks["product_sales"] = (a.product_sales(), b.product_sales())
+        checks["reason_counts"] = (a.reason_counts(), b.reason_counts())
+        checks["revenue_totals"] = (a.revenue_totals(), b.revenue_totals())
+        ca, cb = (customers.analyse(view.customer_rows()) for view in (a, b))
+        for col in ["Recency", "Frequency", "Monetary", "Returns", "R", "F", "M"]:
+            checks[f"customers:{col}"] = tuple(
+                c.customers[col].set_axis(customers.display_ids(c.customers["C_ID"])) for c in (ca, cb))
+        for col in ["Customers", 1, 3]:
+            checks[f"cohorts:{col}"] = tuple(c.cohorts.set_index("Cohort")[col].fillna(-1)
+                                             for c in (ca, cb))
+        da, db = (delivery.analyse(view.partner_rows()) for view in (a, b))
+        for col in ["Orders", "Revenue", "Cost", "Return_Rate", "Late_Rate", "Avg_Rating"]:
+            checks[f"partners:{col}"] = tuple(d.partners.set_index("DP_name")[col].fillna(-1)
+                                              for d in (da, db))
+        for star in cube.STARS:
+            checks[f"ratings:{star}"] = tuple(d.ratings.set_index("DP_name")[star].fillna(-1)
+                                              for d in (da, db))
+        ra, rb = a.rollups(), b.rollups()
+        for key in ra["kpis"]:
+            x, y = ra["kpis"][key], rb["kpis"][key]
+            if not (math.isclose(x, y) or (math.isnan(x) and math.isnan(y))):
+                mismatches.append((*selection, f"rollups:{key}", x, y))
+        for key in ra:
+            if key != "kpis":
+                checks[f"rollups:{key}"] = (ra[key], rb[key])
+        for key, (sa, sb) in checks.items():
+            if not _same_series(sa, sb):
+                mismatches.append((*selection, key, None, None))
+
+    # A reversed month range selects nothing, on either side.
+    dated = [m for m in months if m != "NaT"]
+    spec = analytics.FilterSpec(start_month=dated[-1], end_month=dated[0])
+    selection = ([], [], [], spec.months(months))
+    for name, source in [("reference", reference), ("candidate", candidate)]:
+        orders = source.filter(*selection).kpis()["total_orders"]
+        if orders:
+            mismatches.append((*selection, f"{name}:reversed months", orders, 0))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the DuckDB backend against pandas.")
+    parser.add_argument("--check", action="store_true", required=True)
+    parser.add_argument("--data-dir", default=str(ingest.DATA_DIR))
+    parser.add_argument("--trials", type=int, default=50)
+    args = parser.parse_args()
+
+    reference = cube.build_cube(fact.build_fact_table(ingest.load_tables(args.data_dir)))
+    mismatches = check_parity(reference, DuckDBBackend(args.data_dir), args.trials)
+    for mismatch in mismatches:
+        print("MISMATCH", *mismatch)
+    print(f"{args.trials} filter combinations, {len(mismatches)} mismatches")
+    raise SystemExit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Time every stage of the dashboard pipeline headlessly.
+
+For each scale the synthetic exports are generated (once, under
+``bench_data/``) and the pipeline app.py runs is timed stage by stage: CSV
+load, snapshot write/read, fact-table merge, cube build, filtering, each
+chart aggregate and the KPIs. One JSON object per scale is appended to the
+results file so runs from different versions can be compared.
+
+Usage:
+    python benchmark.py --scales 10k 1m 10m
+"""
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+import analytics
+import cube
+import fact
+import ingest
+import synthetic
+
+FAST_REPEATS = 5
+
+
+def _timed(fn, repeats=1):
+    """(best wall time in seconds, result of the last call)."""
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_pipeline(data_dir):
+    stages = {}
+    stages["load_csv"], tables = _timed(lambda: ingest.read_csv_tables(data_dir))
+    if ingest.feather is not None:
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            stages["snapshot_write"], _ = _timed(
+                lambda: ingest.write_snapshot(data_dir, snapshot_dir, tables))
+            stages["load_snapshot"], _ = _timed(lambda: ingest.read_snapshot(snapshot_dir))
+    stages["merge"], fact_table = _timed(lambda: fact.build_fact_table(tables))
+    stages["cube"], sales_cube = _timed(lambda: cube.build_cube(fact_table))
+
+    # A typical interaction: the biggest state and two categories.
+    top_state = sales_cube.sales_by("State").idxmax()
+    categories = sales_cube.options("Category")[:2]
+    stages["filter_none"], _ = _timed(lambda: sales_cube.filter(), FAST_REPEATS)
+    stages["filter"], view = _timed(
+        lambda: sales_cube.filter([top_state], None, categories), FAST_REPEATS)
+    stages["options_cascade"], _ = _timed(
+        lambda: sales_cube.options("City", State=[top_state]), FAST_REPEATS)
+
+    charts = {
+        "kpis": view.kpis,
+        "state_sales": lambda: view.sales_by("State").sort_values().tail(10),
+        "mode_sales": lambda: view.sales_by("Transaction_Mode"),
+        "product_sales": lambda: view.product_sales().sort_values().tail(10),
+        "return_reasons": lambda: view.reason_counts().sort_values(ascending=False),
+        "monthly_sales": lambda: view.sales_by("Month"),
+    }
+    for name, fn in charts.items():
+        stages[name], _ = _timed(fn, FAST_REPEATS)
+    spec = analytics.FilterSpec(states=(top_state,), categories=tuple(categories))
+    stages["dashboard_per_widget"], _ = _timed(
+        lambda: analytics.compute_dashboard(sales_cube, spec, fused=False), FAST_REPEATS)
+    stages["dashboard"], _ = _timed(lambda: analytics.compute_dashboard(sales_cube, spec),
+                                    FAST_REPEATS)
+
+    sizes = {"fact_rows": len(fact_table), "cube_cells": len(sales_cube.cells),
+             "fact_mb": round(fact.memory_mb(fact_table), 2)}
+    return stages, sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard pipeline.")
+    parser.add_argument("--scales", nargs="+", default=["10k"], help="order counts, e.g. 10k 1m 10m")
+    parser.add_argument("--data-root", default="bench_data")
+    parser.add_argument("--output", default="bench_data/results.jsonl")
+    args = parser.parse_args()
+
+    for scale in args.scales:
+        n_orders = synthetic.parse_scale(scale)
+        data_dir = Path(args.data_root) / str(n_orders)
+        if not (data_dir / "orders.csv").exists():
+            print(f"Generating {n_orders:,} orders in {data_dir} ...")
+            synthetic.generate(data_dir, n_orders)
+
+        stages, sizes = run_pipeline(data_dir)
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "orders": n_orders,
+            **sizes,
+            "stages": {name: round(seconds, 6) for name, seconds in stages.items()},
+        }
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+        print(f"\n{n_orders:,} orders ({sizes['fact_rows']:,} fact rows)")
+        for name, seconds in stages.items():
+            print(f"  {name:<22}{seconds * 1000:>12.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Plotly figures for the dashboard, kept small on the wire.
+
+Every chart is built here from its ``DashboardResult`` table with plain
+``plotly.graph_objects`` traces (Plotly Express re-validates and regroups the
+frame on every call, which costs more than the chart itself). Time series
+are downsampled server-side with Largest-Triangle-Three-Buckets, which keeps
+the visual peaks and troughs, until the figure fits ``payload_budget`` bytes
+of JSON; series with many points switch to WebGL (``Scattergl``). Figures
+are cached by chart name and table contents, so an unchanged aggregate is
+not rebuilt on the next rerun.
+
+Usage:
+    python charts.py --points 100000     # LTTB size and time on a random walk
+"""
+import argparse
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+DEFAULT_MAX_POINTS = 2000       # per time series, before the payload check
+DEFAULT_PAYLOAD_BUDGET = 250_000  # bytes of figure JSON
+WEBGL_POINTS = 1000             # Scattergl above this many points
+FIGURE_CACHE_ENTRIES = 128
+
+LAYOUT = dict(
+    plot_bgcolor="rgba(0,0,0,0)",
+    paper_bgcolor="rgba(0,0,0,0)",
+    font=dict(color="#a0a0a0"),
+    margin=dict(l=0, r=0, t=10, b=0),
+)
+
+
+def lttb(x, y, n_out):
+    """Indices of the `n_out` points Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the point kept
+    from the previous bucket and the mean of the next bucket.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    every = (n - 2) / (n_out - 2)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        next_lo, next_hi = hi, min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev])
+                      - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(np.argmax(area))
+        keep[i + 1] = prev
+    return keep
+
+
+def _numeric_x(x):
+    x = pd.Series(x)
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.astype("int64").to_numpy()
+    if pd.api.types.is_numeric_dtype(x):
+        return x.to_numpy()
+    return np.arange(len(x))  # ordered labels such as "2024-01": evenly spaced
+
+
+def payload_bytes(fig):
+    return len(pio.to_json(fig, validate=False))
+
+
+def bar(df, label, value, colors, x_title="Revenue (₹)", height=350):
+    """Horizontal bar chart coloured by value."""
+    fig = go.Figure(go.Bar(
+        x=df[value], y=df[label].astype(str), orientation="h",
+        marker=dict(color=df[value], colorscale=[[0, colors[0]], [1, colors[1]]]),
+        hovertemplate=f"{label}=%{{y}}<br>{value}=%{{x}}<extra></extra>",
+    ))
+    fig.update_layout(**LAYOUT, showlegend=False, height=height,
+                      xaxis=dict(gridcolor="#2a2a2a", title=x_title),
+                      yaxis=dict(gridcolor="#2a2a2a", title=""))
+    return fig
+
+
+def grouped_bar(df, label, columns, colors, y_title="", height=350):
+    """Vertical bars of `columns` side by side for each `label`."""
+    fig = go.Figure([go.Bar(x=df[label].astype(str), y=df[col], name=str(col), marker_color=color,
+                            hovertemplate=f"{col}<br>%{{x}}=%{{y:.1f}}<extra></extra>")
+                     for col, color in zip(columns, colors)])
+    fig.update_layout(**LAYOUT, barmode="group", height=height,
+                      legend=dict(orientation="h", yanchor="bottom", y=-0.3),
+                      xaxis=dict(title=""), yaxis=dict(gridcolor="#2a2a2a", title=y_title))
+    return fig
+
+
+def donut(df, label, value, colors, height=350):
+    fig = go.Figure(go.Pie(
+        labels=df[label].astype(str), values=df[value], hole=0.55,
+        marker=dict(colors=colors), textposition="inside", textinfo="percent+label",
+    ))
+    fig.update_layout(**LAYOUT, height=height,
+                      legend=dict(orientation="h", yanchor="bottom", y=-0.2))
+    return fig
+
+
+def heatmap(df, label, columns, x_title="", height=400):
+    """Shares (0-1) in `columns`, one row per `label`; missing cells stay blank."""
+    fig = go.Figure(go.Heatmap(
+        z=df[columns].to_numpy(dtype="float64"), x=[str(c) for c in columns],
+        y=df[label].astype(str), colorscale=[[0, "#1a1a2e"], [1, "#00d4ff"]],
+        zmin=0, zmax=1, texttemplate="%{z:.0%}", hoverongaps=False, showscale=False,
+        hovertemplate=f"{label}=%{{y}}<br>{x_title}=%{{x}}<br>%{{z:.1%}}<extra></extra>",
+    ))
+    fig.update_layout(**LAYOUT, height=height,
+                      xaxis=dict(title=x_title, side="top"),
+                      yaxis=dict(title="", autorange="reversed"))
+    return fig
+
+
+def waterfall(df, height=350):
+    """Waterfall of (Step, Amount, Measure) rows as ``revenue.waterfall`` makes them."""
+    fig = go.Figure(go.Waterfall(
+        x=df["Step"], y=df["Amount"], measure=df["Measure"],
+        increasing=dict(marker=dict(color="#10b981")),
+        decreasing=dict(marker=dict(color="#ef4444")),
+        totals=dict(marker=dict(color="#00d4ff")),
+        connector=dict(line=dict(color="#2a2a2a")),
+        hovertemplate="%{x}=%{y:,.0f}<extra></extra>",
+    ))
+    fig.update_layout(**LAYOUT, showlegend=False, height=height,
+                      xaxis=dict(title=""), yaxis=dict(gridcolor="#2a2a2a", title="Revenue (₹)"))
+    return fig
+
+
+def trend(df, x, y, color="#00d4ff", x_title="Month", y_title="Revenue (₹)", height=300,
+          max_points=DEFAULT_MAX_POINTS, payload_budget=DEFAULT_PAYLOAD_BUDGET):
+    """Filled line chart, LTTB-downsampled until it fits `payload_budget`."""
+    xs, ys = df[x], df[y]
+    n_out = max_points
+    while True:
+        keep = lttb(_numeric_x(xs), ys, n_out)
+        scatter = go.Scattergl if len(keep) > WEBGL_POINTS else go.Scatter
+        fig = go.Figure(scatter(
+            x=xs.iloc[keep], y=ys.iloc[keep],
+            mode="lines+markers" if len(keep) <= 200 else "lines",
+            line=dict(color=color, width=3 if len(keep) <= 200 else 1.5),
+            marker=dict(size=10, color=color),
+            fill="tozeroy", fillcolor="rgba(0, 212, 255, 0.1)",
+        ))
+        fig.update_layout(**LAYOUT, height=height,
+                          xaxis=dict(gridcolor="#2a2a2a", title=x_title),
+                          yaxis=dict(gridcolor="#2a2a2a", title=y_title))
+        if len(keep) <= 3 or payload_bytes(fig) <= payload_budget:
+            return fig
+        n_out = len(keep) // 2
+
+
+def trend_with_forecast(df, x, y="Total", color="#7c3aed", **kwargs):
+    """`trend` of the rows with a `y` value plus a dashed forecast line and
+    band for the rows with ``Forecast``, ``Lower`` and ``Upper``."""
+    fig = trend(df[df[y].notna()], x, y, **kwargs)
+    future = df[df["Forecast"].notna()] if "Forecast" in df else df.iloc[:0]
+    if len(future):
+        band_x = pd.concat([future[x], future[x].iloc[::-1]])
+        band_y = pd.concat([future["Upper"], future["Lower"].iloc[::-1]])
+        fig.add_trace(go.Scatter(x=band_x, y=band_y, fill="toself", fillcolor="rgba(124, 58, 237, 0.15)",
+                                 line=dict(width=0), hoverinfo="skip", showlegend=False))
+        fig.add_trace(go.Scatter(x=future[x], y=future["Forecast"], mode="lines", name="Forecast",
+                                 line=dict(color=color, width=2, dash="dash"), showlegend=False))
+    return fig
+
+
+# chart name -> builder(table)
+CHARTS = {
+    "state_sales": lambda df: bar(df, "State", "Total", ["#1e3a5f", "#00d4ff"]),
+    "mode_sales": lambda df: donut(df, "Transaction_Mode", "Total",
+                                   ["#00d4ff", "#7c3aed", "#10b981", "#f59e0b", "#ef4444"]),
+    "product_sales": lambda df: bar(df, "P_Name", "Total", ["#10b981", "#00d4ff"]),
+    "return_reasons": lambda df: donut(df, "Reason", "Count",
+                                       ["#ef4444", "#f59e0b", "#7c3aed", "#00d4ff", "#10b981"]),
+    "monthly_sales": lambda df: trend(df, "Month", "Total"),
+    # (bucket, Total[, Forecast, Lower, Upper]) from analytics.compute_trend
+    "sales_trend": lambda df: trend_with_forecast(df, df.columns[0], x_title=df.columns[0]),
+    # from analytics.compute_customers
+    "customer_segments": lambda df: bar(df, "Segment", "Customers", ["#7c3aed", "#00d4ff"],
+                                        x_title="Customers"),
+    "cohort_retention": lambda df: heatmap(df, "Cohort", list(df.columns[2:]),
+                                           x_title="Months since first order"),
+    "revenue_waterfall": waterfall,
+    # from analytics.compute_delivery
+    "partner_volume": lambda df: bar(df, "DP_name", "Orders", ["#1e3a5f", "#10b981"],
+                                     x_title="Orders"),
+    "partner_cost": lambda df: donut(df, "DP_name", "Cost",
+                                     ["#00d4ff", "#7c3aed", "#10b981", "#f59e0b", "#ef4444"]),
+    "delivery_ratings": lambda df: heatmap(df, "DP_name", list(df.columns[2:]),
+                                           x_title="Delivery rating (stars)", height=320),
+    "partner_returns": lambda df: grouped_bar(df, "DP_name", list(df.columns[1:]),
+                                              ["#ef4444", "#f59e0b", "#7c3aed", "#00d4ff", "#10b981"],
+                                              y_title="Returned orders (%)"),
+}
+
+
+class FigureCache:
+    """LRU of built figures keyed by chart name and table contents.
+
+    Figures are shared between sessions and must not be modified after
+    ``figure()`` returns them.
+    """
+
+    def __init__(self, max_entries=FIGURE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def figure(self, name, df):
+        rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        key = (name, tuple(df.columns), hashlib.sha1(rows.tobytes()).hexdigest())
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return self._figures[key]
+        fig = CHARTS[name](df)
+        with self._lock:
+            self.misses += 1
+            self._figures[key] = fig
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+        return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure LTTB downsampling of a long series.")
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--budget", type=int, default=DEFAULT_PAYLOAD_BUDGET)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "Month": pd.date_range("2023-01-01", periods=args.points, freq="min"),
+        "Total": np.cumsum(rng.normal(0, 1000, args.points)) + 1e6,
+    })
+    full = go.Figure(go.Scattergl(x=df["Month"], y=df["Total"]))
+    t0 = time.perf_counter()
+    fig = trend(df, "Month", "Total", payload_budget=args.budget)
+    elapsed = time.perf_counter() - t0
+    print(f"{args.points:,} points: {payload_bytes(full):,} bytes undownsampled, "
+          f"{len(fig.data[0].x):,} points / {payload_bytes(fig):,} bytes after "
+          f"({type(fig.data[0]).__name__}, {elapsed * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
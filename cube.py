@@ -0,0 +1,285 @@
+"""Pre-aggregated cube answering every dashboard widget without row scans.
+
+The fact table is rolled up once per data version over the filter dimensions
+(State, City, Category, Month) plus Transaction_Mode. Every measure is additive, so any
+filter combination is a slice of the cube and every chart a roll-up of that
+slice; interaction cost scales with the number of dimension combinations, not
+with the number of order rows.
+
+Orders are counted with fractional weights: each fact row of an order carries
+1 / (rows of that order), so the weights of one order sum to exactly 1 however
+the joins fanned it out across Transaction_Mode cells. Distinct customers are
+not additive and come from a separate (State, City, Category, Month, C_ID)
+table, which also keeps each customer's orders, revenue, returns and first
+and last order day for the customer analytics (see ``customers``); the
+first and last day combine by min and max instead of a sum. Revenue over
+time is kept per day and per hour of day (the integer ``timebuckets``
+codes) in two more tables; weeks and months roll up from days.
+The gross-to-net revenue (see ``revenue``) has a table of its own, whose
+Month is the month an amount is booked in: a refund falls in the month of
+the return rather than of the order. Delivery partners (see ``delivery``) have
+one too, per partner and return reason, with the delivery-service ratings
+stored as counts per star so a rating histogram is a sum of counts.
+
+``Cube.rollups()`` answers every number on the page from one pass over each
+filtered table: group keys are integer codes (the categorical codes the cube
+already stores) and every per-group sum is a ``numpy.bincount``.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+import revenue
+import timebuckets
+from fact import concat_frames
+from filter_index import FilterIndex
+
+FILTER_DIMENSIONS = ["State", "City", "Category", "Month"]
+DIMENSIONS = FILTER_DIMENSIONS + ["Transaction_Mode"]
+MEASURES = ["Total", "Rows", "Orders", "Returns", "Rating_Sum", "Rating_Count"]
+
+
+@dataclass
+class Cube:
+    cells: pd.DataFrame      # DIMENSIONS + MEASURES
+    products: pd.DataFrame   # FILTER_DIMENSIONS + P_Name, Total, Rows
+    reasons: pd.DataFrame    # FILTER_DIMENSIONS + Reason, Count
+    customers: pd.DataFrame  # FILTER_DIMENSIONS + C_ID, Rows, Total, Returns, First_Day, Last_Day
+    daily: pd.DataFrame      # FILTER_DIMENSIONS + Order_Day, Total, Rows
+    hourly: pd.DataFrame     # FILTER_DIMENSIONS + Order_Hour, Total, Rows
+    revenue: pd.DataFrame    # FILTER_DIMENSIONS (Month: booked in) + revenue.MEASURES, Rows
+    partners: pd.DataFrame   # FILTER_DIMENSIONS + DP_name, Reason + PARTNER_MEASURES
+    # FilterIndex per table above; only the unfiltered cube carries them.
+    indexes: dict = field(default_factory=dict, repr=False)
+
+    def filter(self, states=None, cities=None, categories=None, months=None):
+        """Slice every table of the cube to the selected dimension values."""
+        selection = {"State": states, "City": cities, "Category": categories, "Month": months}
+
+        def apply(name):
+            df = getattr(self, name)
+            if name in self.indexes:
+                return self.indexes[name].take(df, selection)
+            mask = pd.Series(True, index=df.index)
+            for dim, values in selection.items():
+                if values:
+                    mask &= df[dim].isin(values)
+            return df[mask]
+
+        return Cube(**{name: apply(name) for name in TABLES})
+
+    def options(self, dim, **selection):
+        """Values of a filter dimension, restricted to cells matching `selection`."""
+        if "cells" in self.indexes:
+            return self.indexes["cells"].values(dim, selection)
+        return sorted(self.cells[dim].dropna().unique())
+
+    def kpis(self):
+        total_sales = self.cells["Total"].sum()
+        total_orders = int(round(self.cells["Orders"].sum()))
+        rows = self.cells["Rows"].sum()
+        rating_count = self.cells["Rating_Count"].sum()
+        return {
+            "total_sales": total_sales,
+            "total_orders": total_orders,
+            "total_customers": self.customers["C_ID"].nunique(),
+            "avg_order_value": total_sales / total_orders if total_orders > 0 else 0,
+            "return_rate": self.cells["Returns"].sum() / rows * 100 if rows > 0 else 0,
+            "avg_rating": (self.cells["Rating_Sum"].sum() / rating_count
+                           if rating_count > 0 else float("nan")),
+            "net_revenue": self.revenue["Net"].sum(),
+        }
+
+    def sales_by(self, dim):
+        """Total revenue per value of one cube dimension (missing values dropped)."""
+        return self.cells.groupby(dim, observed=True)["Total"].sum()
+
+    def product_sales(self):
+        return self.products.groupby("P_Name", observed=True)["Total"].sum()
+
+    def reason_counts(self):
+        return self.reasons.groupby("Reason", observed=True)["Count"].sum()
+
+    def revenue_totals(self):
+        """Series of revenue.MEASURES booked in the selection."""
+        return self.revenue[revenue.MEASURES].sum()
+
+    def customer_rows(self):
+        """Per (cell, customer): Month, C_ID and CUSTOMER_MEASURES."""
+        return self.customers
+
+    def partner_rows(self):
+        """Per (cell, partner, return reason): DP_name, Reason and PARTNER_MEASURES."""
+        return self.partners
+
+    def sales_over(self, granularity):
+        """Total revenue per time bucket; `granularity` is a key of
+        ``timebuckets.GRANULARITIES``. Orders without a date or time are dropped."""
+        if granularity == "month":
+            return self.sales_by("Month").drop("NaT", errors="ignore")
+        table, column = (self.hourly, "Order_Hour") if granularity == "hour" else (self.daily, "Order_Day")
+        codes = table[column].to_numpy()
+        if granularity == "week":
+            codes = timebuckets.week_of(codes)
+        present = codes != timebuckets.MISSING
+        totals = pd.Series(table["Total"].to_numpy()[present], name="Total")
+        sums = _sum_by(pd.Series(codes[present], name=column), totals)
+        return sums.set_axis(timebuckets.labels(granularity, sums.index).rename(
+            timebuckets.GRANULARITIES[granularity][1]))
+
+    def rollups(self, dims=("State", "Transaction_Mode", "Month")):
+        """kpis() plus sales_by(dim) for `dims`, product_sales(), reason_counts()
+        and revenue_totals(), fused into one scan of each table instead of a groupby per widget."""
+        cells = self.cells
+        totals = {m: cells[m].to_numpy().sum() for m in MEASURES}
+        total_sales = totals["Total"]
+        total_orders = int(round(totals["Orders"]))
+        customer_codes, customer_ids = _codes(self.customers["C_ID"])
+        amounts = pd.Series({m: self.revenue[m].to_numpy().sum() for m in revenue.MEASURES})
+        out = {
+            "kpis": {
+                "total_sales": total_sales,
+                "total_orders": total_orders,
+                "total_customers": int(np.count_nonzero(
+                    np.bincount(customer_codes[customer_codes >= 0], minlength=len(customer_ids)))),
+                "avg_order_value": total_sales / total_orders if total_orders > 0 else 0,
+                "return_rate": totals["Returns"] / totals["Rows"] * 100 if totals["Rows"] > 0 else 0,
+                "avg_rating": (totals["Rating_Sum"] / totals["Rating_Count"]
+                               if totals["Rating_Count"] > 0 else float("nan")),
+                "net_revenue": amounts["Net"],
+            },
+            "revenue": amounts,
+            "product_sales": _sum_by(self.products["P_Name"], self.products["Total"]),
+            "reason_counts": _sum_by(self.reasons["Reason"], self.reasons["Count"]),
+        }
+        for dim in dims:
+            out[dim] = _sum_by(cells[dim], cells["Total"])
+        return out
+
+
+def _codes(keys):
+    """(integer group codes with -1 for missing, labels) in sorted label order."""
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        return keys.cat.codes.to_numpy(), keys.cat.categories
+    return pd.factorize(keys, sort=True)
+
+
+def _sum_by(keys, values):
+    """``values.groupby(keys, observed=True).sum()`` via bincount."""
+    codes, labels = _codes(keys)
+    present = codes >= 0
+    weights = values.to_numpy()[present]
+    counts = np.bincount(codes[present], minlength=len(labels))
+    sums = np.bincount(codes[present], weights=weights, minlength=len(labels))
+    if weights.dtype.kind in "iub":
+        sums = sums.round().astype("int64")
+    observed = counts > 0
+    return pd.Series(sums[observed], index=labels[observed].rename(keys.name), name=values.name)
+
+
+CUSTOMER_MEASURES = ["Rows", "Total", "Returns", "First_Day", "Last_Day"]
+# Measures combined by min/max instead of summed. Days are float, NaN for
+# orders without a date.
+EXTREMES = {"First_Day": "min", "Last_Day": "max"}
+
+# Orders, gross, the partner's cut, and the delivery-service ratings: their
+# sum and the orders rated each star (a mean of several ratings counts under
+# the nearest star, halves rounding up).
+STARS = range(1, 6)
+STAR_COLUMNS = [f"Stars_{star}" for star in STARS]
+PARTNER_MEASURES = ["Rows", "Total", "Logistics", "Stars_Sum"] + STAR_COLUMNS
+
+# table -> (key columns, measure columns, measure that is zero for an empty cell)
+TABLES = {
+    "cells": (DIMENSIONS, MEASURES, "Rows"),
+    "products": (FILTER_DIMENSIONS + ["P_Name"], ["Total", "Rows"], "Rows"),
+    "reasons": (FILTER_DIMENSIONS + ["Reason"], ["Count"], "Count"),
+    "customers": (FILTER_DIMENSIONS + ["C_ID"], CUSTOMER_MEASURES, "Rows"),
+    "daily": (FILTER_DIMENSIONS + ["Order_Day"], ["Total", "Rows"], "Rows"),
+    "hourly": (FILTER_DIMENSIONS + ["Order_Hour"], ["Total", "Rows"], "Rows"),
+    "revenue": (FILTER_DIMENSIONS, revenue.MEASURES + ["Rows"], "Rows"),
+    "partners": (FILTER_DIMENSIONS + ["DP_name", "Reason"], PARTNER_MEASURES, "Rows"),
+}
+
+
+def aggregate(fact):
+    """The cube tables for a set of fact rows, without indexes."""
+    fact = fact.assign(
+        Orders=1 / fact.groupby("Or_ID", observed=True)["Or_ID"].transform("size"),
+        Returns=fact["Reason"].notna(),
+        Rating_Sum=fact["Prod_Rating"].fillna(0).astype("float64"),
+        Rating_Count=fact["Prod_Rating"].notna(),
+    )
+    cells = (fact.groupby(DIMENSIONS, observed=True, dropna=False)
+             .agg(Total=("Total", "sum"), Rows=("Total", "size"), Orders=("Orders", "sum"),
+                  Returns=("Returns", "sum"), Rating_Sum=("Rating_Sum", "sum"),
+                  Rating_Count=("Rating_Count", "sum"))
+             .reset_index())
+    products = (fact.groupby(FILTER_DIMENSIONS + ["P_Name"], observed=True, dropna=False)
+                .agg(Total=("Total", "sum"), Rows=("Total", "size")).reset_index())
+    reasons = (fact[fact["Reason"].notna()]
+               .groupby(FILTER_DIMENSIONS + ["Reason"], observed=True, dropna=False)
+               .size().reset_index(name="Count"))
+    day = fact["Order_Day"].where(fact["Order_Day"] != timebuckets.MISSING).astype("float64")
+    customers = (fact.assign(Day=day)
+                 .groupby(FILTER_DIMENSIONS + ["C_ID"], observed=True, dropna=False)
+                 .agg(Rows=("Total", "size"), Total=("Total", "sum"), Returns=("Returns", "sum"),
+                      First_Day=("Day", "min"), Last_Day=("Day", "max"))
+                 .reset_index())
+    daily, hourly = (fact.groupby(FILTER_DIMENSIONS + [bucket], observed=True, dropna=False)
+                     .agg(Total=("Total", "sum"), Rows=("Total", "size")).reset_index()
+                     for bucket in ["Order_Day", "Order_Hour"])
+    rating = fact["Delivery_Service_Rating"].astype("float64")
+    stars = np.floor(rating.to_numpy(na_value=np.nan) + 0.5)
+    partners = (fact.assign(Stars_Sum=rating.fillna(0),
+                            **{col: stars == star for star, col in zip(STARS, STAR_COLUMNS)})
+                .groupby(FILTER_DIMENSIONS + ["DP_name", "Reason"], observed=True, dropna=False)
+                .agg(Rows=("Total", "size"), Total=("Total", "sum"), Logistics=("Logistics", "sum"),
+                     Stars_Sum=("Stars_Sum", "sum"), **{col: (col, "sum") for col in STAR_COLUMNS})
+                .reset_index())
+    return {"cells": cells, "products": products, "reasons": reasons, "customers": customers,
+            "daily": daily, "hourly": hourly, "revenue": revenue.booked(fact, FILTER_DIMENSIONS),
+            "partners": partners}
+
+
+def from_tables(tables):
+    indexes = {name: FilterIndex(df, FILTER_DIMENSIONS) for name, df in tables.items()}
+    return Cube(**tables, indexes=indexes)
+
+
+def build_cube(fact):
+    return from_tables(aggregate(fact))
+
+
+def combine(parts):
+    """Sum cube tables (as returned for disjoint or signed sets of fact rows)."""
+    tables = {}
+    for name, (keys, measures, count) in TABLES.items():
+        merged = (concat_frames([part[name] for part in parts])
+                  .groupby(keys, observed=True, dropna=False, sort=False)
+                  .agg({m: EXTREMES.get(m, "sum") for m in measures})
+                  .reset_index())
+        tables[name] = merged[merged[count] != 0].reset_index(drop=True)
+    return tables
+
+
+def apply_delta(cube, removed, added):
+    """A new cube equal to rebuilding after replacing fact rows `removed` by `added`.
+
+    `removed` must hold every fact row of each order it touches (and `added`
+    their replacements), so the fractional order weights stay exact. A min or
+    max cannot be taken back, so replacements must keep their order's day, as
+    an incremental update re-joining existing orders does.
+    """
+    parts = [{name: getattr(cube, name) for name in TABLES}]
+    if len(removed):
+        negated = aggregate(removed)
+        for name, (keys, measures, count) in TABLES.items():
+            sums = [m for m in measures if m not in EXTREMES]
+            negated[name][sums] = -negated[name][sums]
+            negated[name][[m for m in measures if m in EXTREMES]] = np.nan
+        parts.append(negated)
+    if len(added):
+        parts.append(aggregate(added))
+    return from_tables(combine(parts))
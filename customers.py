@@ -0,0 +1,214 @@
+"""Customer analytics: RFM segments, first-order cohorts and repeat purchases.
+
+Everything here is derived from the cube's customers table (one row per
+State, City, Category, Month and customer with the orders, revenue, returns
+and first and last order day in that cell), so it follows the dashboard's
+filters by slicing the cube like every other widget and never rescans orders.
+
+The rows of a selection are reduced to one per customer without a Python
+loop per customer: they are sorted by C_ID once, the group boundaries are
+where the sorted key changes, and each measure is a ``ufunc.reduceat`` over
+those segments (sums for orders, revenue and returns, ``fmin``/``fmax`` for
+the first and last day, which ignore missing dates).
+
+* Recency: days from the customer's last order to the last order of the
+  selection; Frequency: orders; Monetary: revenue.
+* R, F and M scores are quintiles (5 is best) and name a Segment from R and F.
+* Cohort: month of the customer's first order. The retention matrix is the
+  share of each cohort ordering again n months later.
+
+Usage:
+    python customers.py --state Maharashtra
+"""
+import argparse
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+import cube
+import fact
+import ingest
+import timebuckets
+
+SCORES = 5
+# (segment, recency score range, frequency score range), first match wins
+SEGMENTS = [
+    ("Champions", (4, 5), (4, 5)),
+    ("Loyal", (3, 5), (3, 5)),
+    ("Recent", (4, 5), (1, 2)),
+    ("Promising", (3, 3), (1, 2)),
+    ("At Risk", (1, 2), (3, 5)),
+    ("Hibernating", (1, 2), (1, 2)),
+]
+MAX_COHORT_MONTHS = 12  # months after the first order shown in the matrix
+
+
+@dataclass
+class CustomerResult:
+    kpis: dict
+    customers: pd.DataFrame  # C_ID, Recency, Frequency, Monetary, Returns, Cohort, R, F, M, Segment
+    segments: pd.DataFrame   # Segment, Customers, Revenue, Recency, Frequency, Monetary
+    cohorts: pd.DataFrame    # Cohort, Customers, then retention at 0, 1, ... months
+    insights: dict = field(default_factory=dict)
+
+
+def display_ids(ids):
+    """C_IDs as "CS_..." whether `ids` holds integer codes or the IDs already."""
+    ids = pd.Series(ids)
+    if pd.api.types.is_integer_dtype(ids):
+        return ingest.decode_key("C_ID", ids)
+    return ids
+
+
+def _boundaries(sorted_keys):
+    """Start of every run of equal values in `sorted_keys`."""
+    if len(sorted_keys) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+
+
+def customer_table(rows):
+    """One row per customer of `rows` (a ``customer_rows()`` table).
+
+    Returns the frame and, for each input row, the position of its customer.
+    """
+    keys = rows["C_ID"].to_numpy()
+    order = np.argsort(keys, kind="stable")
+    starts = _boundaries(keys[order])
+    is_start = np.zeros(len(keys), dtype=bool)
+    is_start[starts] = True
+    owner = np.empty(len(keys), dtype=np.int64)
+    owner[order] = np.cumsum(is_start) - 1
+
+    def reduce(ufunc, col, dtype="float64"):
+        values = rows[col].to_numpy(dtype=dtype)[order]
+        return ufunc.reduceat(values, starts) if len(starts) else values[:0]
+
+    first, last = reduce(np.fmin, "First_Day"), reduce(np.fmax, "Last_Day")
+    reference = np.nanmax(last) if len(last) and not np.isnan(last).all() else np.nan
+    days = np.nan_to_num(first).astype("int64").astype("datetime64[D]")
+    first_month = np.where(np.isnan(first), timebuckets.MISSING,
+                           days.astype("datetime64[M]").astype("int64"))
+    table = pd.DataFrame({
+        "C_ID": keys[order][starts],
+        "Recency": reference - last,
+        "Frequency": reduce(np.add, "Rows", "int64"),
+        "Monetary": reduce(np.add, "Total"),
+        "Returns": reduce(np.add, "Returns", "int64"),
+        "Cohort_Month": first_month,
+    })
+    return table, owner
+
+
+def _score(values):
+    """Quintile scores 1-5, higher for higher values; ties are split by
+    position so every score is used."""
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[np.argsort(values, kind="stable")] = np.arange(1, len(values) + 1)
+    return np.ceil(ranks * SCORES / max(len(values), 1)).clip(1, SCORES).astype("int8")
+
+
+def add_scores(table):
+    """`table` with R, F and M scores and the Segment they name."""
+    r = _score(-table["Recency"].fillna(np.inf).to_numpy())
+    f = _score(table["Frequency"].to_numpy())
+    m = _score(table["Monetary"].to_numpy())
+    conditions = [(r >= r_lo) & (r <= r_hi) & (f >= f_lo) & (f <= f_hi)
+                  for _, (r_lo, r_hi), (f_lo, f_hi) in SEGMENTS]
+    segment = np.select(conditions, range(len(SEGMENTS)), default=len(SEGMENTS))
+    return table.assign(R=r, F=f, M=m, Segment=pd.Categorical.from_codes(
+        segment, categories=[name for name, *_ in SEGMENTS] + ["Other"]))
+
+
+def segment_summary(table):
+    summary = (table.groupby("Segment", observed=True)
+               .agg(Customers=("C_ID", "size"), Revenue=("Monetary", "sum"),
+                    Recency=("Recency", "mean"), Frequency=("Frequency", "mean"),
+                    Monetary=("Monetary", "mean"))
+               .reset_index())
+    return summary.sort_values("Revenue", ascending=False, ignore_index=True)
+
+
+def _month_codes(months):
+    """``Order_Month`` codes of a Month column, parsing each distinct label once."""
+    codes, labels = pd.factorize(months)
+    return timebuckets.month_codes(np.asarray(labels, dtype=str))[codes]
+
+
+def cohort_matrix(rows, table, owner, max_months=MAX_COHORT_MONTHS):
+    """Share of each first-order cohort active 0..`max_months` months later."""
+    columns = ["Cohort", "Customers"] + list(range(max_months + 1))
+    months = _month_codes(rows["Month"])
+    cohort = table["Cohort_Month"].to_numpy()[owner]
+    active = (months != timebuckets.MISSING) & (cohort != timebuckets.MISSING)
+    active &= months - cohort <= max_months
+    if not active.any():
+        return pd.DataFrame(columns=columns)
+    # Distinct (customer, months since first order) pairs: a customer counts
+    # once per month however many cells it has there.
+    width = max_months + 1
+    seen = np.zeros(len(table) * width, dtype=bool)
+    seen[owner[active] * width + (months - cohort)[active]] = True
+    pairs = np.flatnonzero(seen)
+    cohort = table["Cohort_Month"].to_numpy()[pairs // width]
+    first, last = cohort.min(), cohort.max()
+    counts = np.bincount((cohort - first) * width + pairs % width,
+                         minlength=(last - first + 1) * width).reshape(-1, width).astype("float64")
+    sizes = counts[:, 0]
+    present = sizes > 0
+    shares = counts[present] / sizes[present, None]
+    cohorts = np.arange(first, last + 1)[present]
+    matrix = pd.DataFrame(shares, columns=list(range(width)))
+    # Months after the last month in the data are unknown, not zero.
+    horizon = months[months != timebuckets.MISSING].max() - cohorts
+    matrix = matrix.mask(np.arange(width)[None, :] > horizon[:, None])
+    matrix.insert(0, "Customers", sizes[present].astype("int64"))
+    matrix.insert(0, "Cohort", list(timebuckets.labels("month", cohorts)))
+    return matrix
+
+
+def analyse(rows):
+    """CustomerResult of a ``customer_rows()`` table."""
+    table, owner = customer_table(rows)
+    customers = add_scores(table).assign(
+        Cohort=timebuckets.month_labels(table["Cohort_Month"].to_numpy())).drop(columns="Cohort_Month")
+    n = len(customers)
+    repeat = int((customers["Frequency"] > 1).sum())
+    kpis = {
+        "customers": n,
+        "repeat_customers": repeat,
+        "repeat_rate": repeat / n * 100 if n else 0,
+        "orders_per_customer": customers["Frequency"].mean() if n else 0,
+        "revenue_per_customer": customers["Monetary"].mean() if n else 0,
+        "customers_with_returns": int((customers["Returns"] > 0).sum()),
+    }
+    segments = segment_summary(customers)
+    insights = {}
+    if len(segments):
+        top = segments.iloc[0]
+        insights = {"top_segment": top["Segment"],
+                    "top_segment_share": top["Revenue"] / segments["Revenue"].sum() * 100
+                    if segments["Revenue"].sum() else 0}
+    return CustomerResult(kpis, customers, segments, cohort_matrix(rows, table, owner), insights)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print customer analytics for a selection.")
+    parser.add_argument("--data-dir", default=str(ingest.DATA_DIR))
+    parser.add_argument("--state", action="append", default=[])
+    parser.add_argument("--category", action="append", default=[])
+    args = parser.parse_args()
+
+    source = cube.build_cube(fact.build_fact_table(ingest.load_tables(args.data_dir)))
+    result = analyse(source.filter(states=args.state, categories=args.category).customer_rows())
+    for name, value in result.kpis.items():
+        print(f"{name:<24}{value:>14,.2f}")
+    print()
+    print(result.segments.to_string(index=False, float_format=lambda v: f"{v:,.1f}"))
+    print()
+    print(result.cohorts.to_string(index=False, float_format=lambda v: f"{v:.0%}"))
+
+
+if __name__ == "__main__":
+    main()
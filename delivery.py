@@ -0,0 +1,131 @@
+"""Delivery-partner performance: volume, delivery ratings, returns and cost.
+
+Everything here is derived from the cube's partners table (one row per
+State, City, Category, Month, delivery partner and return reason with the
+orders, their gross, the partner's cut and the delivery-service ratings as a
+sum and a count per star), so it follows the dashboard's filters by slicing
+the cube like every other widget. The rating histograms are the stored star
+counts summed, not ratings recounted from orders on each filter change.
+
+* Volume: the partner's orders and their share of all orders.
+* Cost: the partner's cut (revenue's Logistics), its share of the cut paid to
+  all partners and its rate on the gross the partner delivered.
+* Returns: orders returned per reason, as a percent of the partner's orders;
+  "Late Delivery" is the one a partner is answerable for.
+
+Usage:
+    python delivery.py --state Maharashtra
+"""
+import argparse
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+import cube
+import fact
+import ingest
+
+LATE = "Late Delivery"
+ALL = "All partners"  # label of the ratings row of every partner together
+
+
+@dataclass
+class DeliveryResult:
+    kpis: dict
+    partners: pd.DataFrame  # DP_name, Orders, Volume_Share, Revenue, Cost, Cost_Share, Cost_Rate,
+                            # Return_Rate, Late_Rate, Avg_Rating
+    ratings: pd.DataFrame   # DP_name, Ratings, then the share of orders rated 1..5 stars
+    returns: pd.DataFrame   # DP_name, then the return rate (% of orders) per Reason
+    insights: dict = field(default_factory=dict)
+
+
+def _percent(part, whole):
+    return np.divide(part * 100, whole, out=np.zeros(len(part)), where=whole > 0)
+
+
+def rating_shares(sums):
+    """Ratings and the share of each star of `sums` (PARTNER_MEASURES by partner)."""
+    counts = sums[cube.STAR_COLUMNS].to_numpy(dtype="float64")
+    rated = counts.sum(axis=1)
+    shares = np.divide(counts, rated[:, None], out=np.full_like(counts, np.nan),
+                       where=rated[:, None] > 0)
+    out = pd.DataFrame(shares, columns=list(cube.STARS))
+    out.insert(0, "Ratings", rated.astype("int64"))
+    out.insert(0, "DP_name", sums.index.astype(str))
+    return out
+
+
+def analyse(rows):
+    """DeliveryResult of a ``partner_rows()`` table."""
+    rows = rows[rows["DP_name"].notna()]
+    sums = rows.groupby("DP_name", observed=True)[cube.PARTNER_MEASURES].sum()
+    sums = sums[sums["Rows"] > 0].sort_values("Rows", ascending=False)
+    returned = rows[rows["Reason"].notna()]
+    by_reason = (returned.groupby(["DP_name", "Reason"], observed=True)["Rows"].sum()
+                 .unstack(fill_value=0).reindex(sums.index, fill_value=0))
+    by_reason.columns = by_reason.columns.astype(str)
+
+    orders = sums["Rows"].to_numpy(dtype="float64")
+    revenue = sums["Total"].to_numpy(dtype="float64")
+    cost = sums["Logistics"].to_numpy(dtype="float64")
+    rated = sums[cube.STAR_COLUMNS].to_numpy().sum(axis=1)
+    late = by_reason[LATE].to_numpy() if LATE in by_reason else np.zeros(len(sums))
+    partners = pd.DataFrame({
+        "DP_name": sums.index.astype(str),
+        "Orders": sums["Rows"].to_numpy(dtype="int64"),
+        "Volume_Share": _percent(orders, orders.sum()),
+        "Revenue": revenue,
+        "Cost": cost,
+        "Cost_Share": _percent(cost, cost.sum()),
+        "Cost_Rate": _percent(cost, revenue),
+        "Return_Rate": _percent(by_reason.to_numpy().sum(axis=1), orders),
+        "Late_Rate": _percent(late, orders),
+        "Avg_Rating": np.divide(sums["Stars_Sum"].to_numpy(), rated, out=np.full(len(sums), np.nan),
+                                where=rated > 0),
+    })
+
+    overall = sums.sum().to_frame(ALL).T
+    ratings = pd.concat([rating_shares(sums), rating_shares(overall)], ignore_index=True)
+    returns = by_reason.div(np.maximum(orders, 1), axis=0).mul(100).reset_index()
+    returns["DP_name"] = returns["DP_name"].astype(str)
+
+    total_rated = rated.sum()
+    kpis = {
+        "partners": len(partners),
+        "avg_delivery_rating": sums["Stars_Sum"].sum() / total_rated if total_rated else float("nan"),
+        "late_delivery_rate": late.sum() / orders.sum() * 100 if orders.sum() else 0,
+        "logistics_cost": cost.sum(),
+        "cost_rate": cost.sum() / revenue.sum() * 100 if revenue.sum() else 0,
+    }
+    insights = {}
+    if len(partners):
+        latest = partners.loc[partners["Late_Rate"].idxmax()]
+        priciest = partners.loc[partners["Cost_Share"].idxmax()]
+        insights = {"late_partner": latest["DP_name"], "late_rate": latest["Late_Rate"],
+                    "cost_partner": priciest["DP_name"], "cost_share": priciest["Cost_Share"],
+                    "volume_share": priciest["Volume_Share"]}
+    return DeliveryResult(kpis, partners, ratings, returns, insights)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print delivery-partner performance for a selection.")
+    parser.add_argument("--data-dir", default=str(ingest.DATA_DIR))
+    parser.add_argument("--state", action="append", default=[])
+    parser.add_argument("--category", action="append", default=[])
+    args = parser.parse_args()
+
+    source = cube.build_cube(fact.build_fact_table(ingest.load_tables(args.data_dir)))
+    result = analyse(source.filter(states=args.state, categories=args.category).partner_rows())
+    for name, value in result.kpis.items():
+        print(f"{name:<24}{value:>14,.2f}")
+    print()
+    print(result.partners.to_string(index=False, float_format=lambda v: f"{v:,.1f}"))
+    print()
+    print(result.ratings.to_string(index=False, float_format=lambda v: f"{v:.0%}"))
+    print()
+    print(result.returns.to_string(index=False, float_format=lambda v: f"{v:.1f}%"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Build the compact orders fact table the dashboard runs on.
+
+Only the columns a widget actually reads survive the join: addresses, phone
+numbers, names and the surrogate IDs of the side tables (R_ID, RT_ID, Tr_ID)
+are projected away before merging. Repeated keys and low-cardinality text
+are stored as categoricals and numeric measures are downcast.
+
+The ID keys arrive as integers (see ``ingest.encode_keys``), so no join
+hashes a string. A dimension table (customers, products, delivery) has one
+row per key and is joined by direct array lookup: key minus the smallest key
+is the slot holding that row.
+
+The order feeds (ratings, returns, transactions) can hold several rows per
+order, and joining them as they are repeats the order once per row, counting
+its Total as often. Each feed is therefore collapsed to one row per order
+first, by the policy in COLLAPSE, and every join is validated many-to-one,
+so the fact table has exactly one row per order.
+
+Usage:
+    python fact.py                    # per-table memory before/after
+    python fact.py --cardinality      # rows per order in each feed
+"""
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import ingest
+import revenue
+import timebuckets
+
+log = logging.getLogger("ajio.ingest")
+
+# Columns each source table contributes to the fact table. The first column
+# is the join key; a table that would contribute nothing else is not joined.
+# revenue.INPUTS are joined too, and replaced by the amounts derived from them.
+COLUMNS = {
+    "orders": ["Or_ID", "C_ID", "P_ID", "DP_ID", "Order_Day", "Order_Month", "Order_Hour", "Qty",
+               "Discount"],
+    "customers": ["C_ID", "City", "State"],
+    "products": ["P_ID", "P_Name", "Category", "Price"],
+    "ratings": ["Or_ID", "Prod_Rating", "Delivery_Service_Rating"],
+    "returns": ["Or_ID", "Reason", "Return_Refund", "Dates"],
+    "transactions": ["Or_ID", "Transaction_Mode"],
+    "delivery": ["DP_ID", "DP_name", "Percent_Cut"],
+}
+
+# Joined onto orders in this order.
+JOINS = ["customers", "products", "ratings", "returns", "transactions", "delivery"]
+
+# order feed -> (how, ordering column): how its rows for one order become one.
+# "mean" averages the values; "last" keeps the last row by the ordering
+# column, or by position in the feed (which is append-only) when there is
+# none. A missing ordering value sorts first, and feed order breaks ties.
+# Changing a policy changes the numbers of an unchanged data version: bump
+# result_cache.RESULT_FORMAT with it, so cached results are not served.
+COLLAPSE = {
+    "ratings": ("mean", None),           # the order's mean product and delivery ratings
+    "returns": ("last", "Dates"),        # its latest return
+    "transactions": ("last", None),      # its last transaction
+}
+
+CATEGORICAL = ["P_Name", "Category", "City", "State", "Reason",
+               "Transaction_Mode", "DP_name", "Month"]
+
+
+def project_tables(tables):
+    """Narrow every source table to the columns listed in COLUMNS."""
+    return {name: tables[name][cols] for name, cols in COLUMNS.items()}
+
+
+def _downcast(s):
+    if pd.api.types.is_float_dtype(s):
+        return s.astype("float32")
+    if pd.api.types.is_integer_dtype(s):
+        return pd.to_numeric(s, downcast="integer")
+    return s
+
+
+def collapse(name, df):
+    """One row per order of order feed `name`, by its COLLAPSE policy."""
+    key = COLUMNS[name][0]
+    how, order_by = COLLAPSE[name]
+    if how == "mean":
+        return df.groupby(key, sort=False).mean().reset_index()
+    if order_by is not None:
+        df = df.sort_values(order_by, kind="stable", na_position="first")
+    return df.drop_duplicates(key, keep="last")
+
+
+def cardinality_report(tables):
+    """Rows of (table, rows, orders, repeated orders, most rows per order, policy)
+    for the order feeds, before they are collapsed."""
+    rows = []
+    for name, (how, order_by) in COLLAPSE.items():
+        per_order = tables[name][COLUMNS[name][0]].value_counts()
+        rows.append((name, len(tables[name]), len(per_order), int((per_order > 1).sum()),
+                     int(per_order.max()) if len(per_order) else 0,
+                     how if order_by is None else f"{how} by {order_by}"))
+    return pd.DataFrame(rows, columns=["table", "rows", "orders", "repeated", "max_rows", "policy"])
+
+
+def _lookup_positions(keys, left_keys):
+    """Row of `keys` matching each of `left_keys` (-1 if none), by direct
+    addressing; None when `keys` repeat or are too sparse for a lookup array."""
+    if len(keys) == 0:
+        return np.full(len(left_keys), -1, dtype=np.int64)
+    lo, hi = int(keys.min()), int(keys.max())
+    if hi - lo + 1 > 4 * len(keys) + 1024:
+        return None
+    slots = np.full(hi - lo + 1, -1, dtype=np.int64)
+    slots[keys - lo] = np.arange(len(keys))
+    if np.count_nonzero(slots >= 0) != len(keys):
+        return None
+    positions = np.full(len(left_keys), -1, dtype=np.int64)
+    inside = (left_keys >= lo) & (left_keys <= hi)
+    positions[inside] = slots[left_keys[inside] - lo]
+    return positions
+
+
+def _sorted_positions(keys, left_keys):
+    """(left row, right row or -1) pairs of a left join, in merge order.
+    `keys` must not be empty."""
+    order = np.argsort(keys, kind="stable")
+    lo, hi = int(keys.min()), int(keys.max())
+    if hi - lo + 1 <= 4 * len(keys) + 1024:
+        # Dense keys: run starts and lengths by direct addressing.
+        per_key = np.bincount(keys - lo, minlength=hi - lo + 1)
+        inside = (left_keys >= lo) & (left_keys <= hi)
+        slot = np.where(inside, left_keys - lo, 0)
+        start = (np.cumsum(per_key) - per_key)[slot]
+        counts = np.where(inside, per_key[slot], 0)
+    else:
+        sorted_keys = keys[order]
+        start = np.searchsorted(sorted_keys, left_keys, side="left")
+        counts = np.searchsorted(sorted_keys, left_keys, side="right") - start
+    runs = np.maximum(counts, 1)
+    left_rows = np.repeat(np.arange(len(left_keys)), runs)
+    offsets = np.arange(len(left_rows)) - np.repeat(np.cumsum(runs) - runs, runs)
+    matched = np.repeat(counts, runs) > 0
+    right_rows = np.full(len(left_rows), -1, dtype=np.int64)
+    right_rows[matched] = order[np.repeat(start, runs)[matched] + offsets[matched]]
+    return left_rows, right_rows
+
+
+def _take(df, rows):
+    """Columns of `df` at positions `rows`, missing where a position is -1."""
+    return {col: pd.api.extensions.take(df[col].array, rows, allow_fill=True) for col in df}
+
+
+def left_join(left, right, key, validate=None):
+    """``left.merge(right, on=key, how="left", validate=validate)`` on an integer
+    key, by position. Only "m:1" is checked; it raises ``MergeError`` if
+    `right` repeats a key."""
+    if not (pd.api.types.is_integer_dtype(left[key]) and pd.api.types.is_integer_dtype(right[key])):
+        return left.merge(right, on=key, how="left", validate=validate)
+    left_keys, keys = left[key].to_numpy(), right[key].to_numpy()
+    if validate == "m:1" and not pd.Index(keys).is_unique:
+        raise pd.errors.MergeError(f"{key} repeats in the right table; not a many-to-one merge")
+    right_rows = _lookup_positions(keys, left_keys)
+    if right_rows is None:
+        left_rows, right_rows = _sorted_positions(keys, left_keys)
+        out = left.take(left_rows)
+    else:
+        out = left.copy()
+    out = out.reset_index(drop=True)
+    for col, values in _take(right.drop(columns=key), right_rows).items():
+        out[col] = values
+    return out
+
+
+def join_orders(projected, orders):
+    """Fact rows for `orders`, one per order, joined against already-projected
+    source tables (the order feeds not yet collapsed)."""
+    subset = len(orders) < len(projected["orders"])
+    fact = orders
+    for name in JOINS:
+        cols = COLUMNS[name]
+        if len(cols) == 1:
+            continue
+        right = projected[name]
+        if name in COLLAPSE:
+            if subset:  # an incremental update: only the feed rows of these orders
+                right = right[right[cols[0]].isin(orders[cols[0]])]
+            right = collapse(name, right)
+        fact = left_join(fact, right, cols[0], validate="m:1")
+    assert len(fact) == len(orders)
+
+    fact["Total"] = fact["Qty"].astype("int64") * fact["Price"]
+    fact = revenue.add_amounts(fact)
+    fact["Month"] = timebuckets.month_labels(fact["Order_Month"].to_numpy())
+    fact = fact.drop(columns=["P_ID", "DP_ID", "Order_Month"])
+
+    for col in CATEGORICAL:
+        fact[col] = fact[col].astype("category")
+    # The ratings, now means, stay float64 so rating sums match the SQL backend.
+    for col in ["Or_ID", "C_ID", "Qty", "Price"]:
+        fact[col] = _downcast(fact[col])
+    return fact
+
+
+def build_fact_table(tables):
+    """Join the projected source tables into one row per order."""
+    projected = project_tables(tables)
+    for row in cardinality_report(projected).itertuples():
+        if row.repeated:
+            log.info("%s: %d of %d orders have several rows (up to %d); collapsed to %s",
+                     row.table, row.repeated, row.orders, row.max_rows, row.policy)
+    return join_orders(projected, projected["orders"])
+
+
+def concat_frames(frames):
+    """Concatenate frames, unioning categoricals so they stay categorical."""
+    nonempty = [df for df in frames if len(df)]
+    if len(nonempty) <= 1:
+        return (nonempty or frames)[0].reset_index(drop=True)
+    out = pd.concat(nonempty, ignore_index=True)
+    for col in nonempty[0].columns:
+        if isinstance(nonempty[0][col].dtype, pd.CategoricalDtype):
+            try:
+                out[col] = union_categoricals([df[col] for df in nonempty], sort_categories=True,
+                                               ignore_order=True)
+            except TypeError:  # e.g. an all-missing column with untyped categories
+                out[col] = out[col].astype("category")
+    return out
+
+
+def build_full_table(tables):
+    """The original unprojected merge, with its row fan-out, kept for the
+    memory comparison."""
+    full = tables["orders"]
+    for name in JOINS:
+        key = COLUMNS[name][0]
+        full = full.merge(tables[name], on=key, how="left")
+    full["Total"] = full["Qty"] * full["Price"]
+    return full
+
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def memory_report(tables):
+    """Rows of (table, rows, MB before, MB after) for the sources and the fact table."""
+    projected = project_tables(tables)
+    rows = [(name, len(df), memory_mb(df), memory_mb(projected[name]))
+            for name, df in tables.items()]
+    fact = build_fact_table(tables)
+    rows.append(("orders_full", len(fact), memory_mb(build_full_table(tables)), memory_mb(fact)))
+    return pd.DataFrame(rows, columns=["table", "rows", "before_mb", "after_mb"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the fact table's memory or the feeds' cardinality.")
+    parser.add_argument("--data-dir", default=str(ingest.DATA_DIR))
+    parser.add_argument("--cardinality", action="store_true",
+                        help="rows per order in each order feed instead of memory")
+    args = parser.parse_args()
+
+    tables = ingest.load_tables(args.data_dir)
+    if args.cardinality:
+        print(cardinality_report(tables).to_string(index=False))
+        return
+    report = memory_report(tables)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+
+
+if __name__ == "__main__":
+    main()
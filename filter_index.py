@@ -0,0 +1,95 @@
+"""Inverted index over the sidebar filter dimensions of a frame.
+
+For every dimension the row positions are stored grouped by value (CSR
+layout: one sorted position array plus per-value offsets), so the rows for a
+set of values are a few array slices instead of an ``isin`` scan over the
+whole column. A filter drives from the most selective dimension and probes
+the remaining ones only at those positions, then does a single ``take``.
+"""
+import numpy as np
+import pandas as pd
+
+
+class FilterIndex:
+    def __init__(self, df, dims):
+        self.n_rows = len(df)
+        self.categories = {}
+        self.codes = {}
+        self.positions = {}
+        self.offsets = {}
+        for dim in dims:
+            col = df[dim]
+            if not isinstance(col.dtype, pd.CategoricalDtype):
+                col = col.astype("category")
+            codes = col.cat.codes.to_numpy()
+            n_values = len(col.cat.categories)
+            # NaN is code -1; shifting by one keeps it out of every posting.
+            counts = np.bincount(codes + 1, minlength=n_values + 1)[1:]
+            order = np.argsort(codes, kind="stable")
+            self.categories[dim] = col.cat.categories
+            self.codes[dim] = codes
+            self.positions[dim] = order[len(codes) - counts.sum():]
+            self.offsets[dim] = np.concatenate([[0], np.cumsum(counts)])
+
+    @classmethod
+    def attach(cls, df, dims, positions, offsets):
+        """Index over categorical `df` from arrays saved by ``arrays()``.
+
+        Nothing is copied: the codes are the frame's own and the postings are
+        used as given, so memory-mapped inputs stay shared between processes.
+        """
+        index = cls.__new__(cls)
+        index.n_rows = len(df)
+        index.categories = {dim: df[dim].cat.categories for dim in dims}
+        index.codes = {dim: df[dim].array.codes for dim in dims}
+        index.positions = dict(positions)
+        index.offsets = dict(offsets)
+        return index
+
+    def arrays(self):
+        """(positions, offsets) by dimension, for ``attach``."""
+        return self.positions, self.offsets
+
+    def _value_codes(self, dim, values):
+        codes = self.categories[dim].get_indexer(list(values))
+        return codes[codes >= 0]
+
+    def _postings(self, dim, codes):
+        offsets = self.offsets[dim]
+        size = (offsets[codes + 1] - offsets[codes]).sum()
+        if size == 0:
+            return np.empty(0, dtype=np.intp)
+        parts = [self.positions[dim][offsets[c]:offsets[c + 1]] for c in codes]
+        return np.sort(np.concatenate(parts))
+
+    def rows(self, selection):
+        """Sorted row positions matching every non-empty selection, or None for all rows."""
+        active = {dim: self._value_codes(dim, values)
+                  for dim, values in selection.items() if values}
+        if not active:
+            return None
+
+        def size(item):
+            dim, codes = item
+            offsets = self.offsets[dim]
+            return (offsets[codes + 1] - offsets[codes]).sum()
+
+        (lead, lead_codes), *rest = sorted(active.items(), key=size)
+        rows = self._postings(lead, lead_codes)
+        for dim, codes in rest:
+            rows = rows[np.isin(self.codes[dim][rows], codes)]
+        return rows
+
+    def take(self, df, selection):
+        rows = self.rows(selection)
+        return df if rows is None else df.take(rows)
+
+    def values(self, dim, selection=None):
+        """Sorted values of `dim` present among the rows matching `selection`.
+
+        Used to cascade the sidebar options, e.g. cities of the chosen states.
+        """
+        rows = self.rows(selection or {})
+        codes = self.codes[dim] if rows is None else self.codes[dim][rows]
+        present = np.flatnonzero(np.bincount(codes + 1, minlength=len(self.categories[dim]) + 1)[1:])
+        return sorted(self.categories[dim][present])
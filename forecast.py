@@ -0,0 +1,93 @@
+"""Sales forecast drawn over the trend chart.
+
+A Prophet model is fitted to the trend of the current selection (revenue per
+day, week or month; an hour-of-day profile is not a time series) and
+predicts the next few periods with an uncertainty band. A fit takes a second
+or more, so the dashboard fits once per data version, filter selection and
+granularity and keeps the forecasts in a bounded cache instead of refitting
+on every interaction.
+
+prophet is optional: without it ``available()`` is false and the overlay is
+not offered.
+
+Usage:
+    python forecast.py --granularity week --state Maharashtra
+"""
+import argparse
+import logging
+
+import pandas as pd
+
+import analytics
+import cube
+import fact
+import ingest
+
+try:
+    from prophet import Prophet
+except ImportError:  # the dashboard works without forecasts
+    Prophet = None
+else:
+    # Quiet the per-fit INFO lines; cmdstanpy resets its level unless a handler exists.
+    for name in ["cmdstanpy", "prophet"]:
+        logging.getLogger(name).addHandler(logging.NullHandler())
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+# periods forecast ahead per granularity
+HORIZONS = {"day": 30, "week": 12, "month": 3}
+FREQUENCIES = {"day": "D", "week": "W-MON", "month": "MS"}
+MIN_HISTORY = 6  # periods with a value; fewer gives no forecast
+CACHE_ENTRIES = 64
+COLUMNS = ["Forecast", "Lower", "Upper"]
+
+
+def available(granularity):
+    return Prophet is not None and granularity in HORIZONS
+
+
+def forecast(trend, granularity, horizon=None):
+    """Forecast for the periods after `trend`, a ``compute_trend`` frame.
+
+    Returns (bucket, Forecast, Lower, Upper) rows, or no rows when the
+    history is too short or no forecast is available for `granularity`.
+    """
+    label = trend.columns[0]
+    if not available(granularity):
+        return pd.DataFrame(columns=[label] + COLUMNS)
+    history = pd.DataFrame({"ds": pd.to_datetime(trend[label], errors="coerce"),
+                            "y": trend["Total"].astype("float64")}).dropna()
+    if len(history) < MIN_HISTORY:
+        return pd.DataFrame(columns=[label] + COLUMNS)
+
+    model = Prophet(weekly_seasonality=granularity == "day", daily_seasonality=False)
+    model.fit(history)
+    future = model.make_future_dataframe(horizon or HORIZONS[granularity],
+                                         freq=FREQUENCIES[granularity], include_history=False)
+    predicted = model.predict(future)
+    buckets = predicted["ds"].dt.strftime("%Y-%m") if granularity == "month" else predicted["ds"]
+    # Revenue cannot go negative, whatever the linear trend says.
+    return pd.DataFrame({label: buckets.to_numpy(),
+                         "Forecast": predicted["yhat"].clip(lower=0).to_numpy(),
+                         "Lower": predicted["yhat_lower"].clip(lower=0).to_numpy(),
+                         "Upper": predicted["yhat_upper"].clip(lower=0).to_numpy()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast the sales trend of a selection.")
+    parser.add_argument("--data-dir", default=str(ingest.DATA_DIR))
+    parser.add_argument("--granularity", choices=list(HORIZONS), default="month")
+    parser.add_argument("--horizon", type=int)
+    parser.add_argument("--state", action="append", default=[])
+    parser.add_argument("--category", action="append", default=[])
+    args = parser.parse_args()
+
+    if not available(args.granularity):
+        parser.error("forecasting needs the prophet package")
+    source = cube.build_cube(fact.build_fact_table(ingest.load_tables(args.data_dir)))
+    spec = analytics.FilterSpec(states=tuple(args.state), categories=tuple(args.category))
+    trend = analytics.compute_trend(source, spec, args.granularity)
+    print(forecast(trend, args.granularity, args.horizon).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
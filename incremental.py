@@ -0,0 +1,148 @@
+"""Incremental ingest of rows appended to the AJIO exports.
+
+orders, ratings, returns and transactions are append-only feeds. Instead of
+re-reading and re-merging all seven files when one of them grows, the loader
+remembers how many bytes of each feed it has consumed, parses only the new
+tail, re-joins just the orders those rows touch (new orders, or existing
+orders receiving a late rating, return or transaction) and patches the cube
+and sketches by delta.
+
+customers, products and delivery are dimension tables; a change to any of
+them, or a feed that was rewritten rather than appended to, triggers a full
+rebuild. A feed counts as rewritten when it shrank or when the bytes already
+consumed changed: their first and last PREFIX_CHECK_BYTES are hashed at each
+read, which catches a rewrite to the same or a larger size without re-reading
+the whole feed on every refresh.
+"""
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+import pandas as pd
+
+import cube
+import fact
+import ingest
+import sketch
+
+APPEND_ONLY = ["orders", "ratings", "returns", "transactions"]
+DIMENSION_TABLES = [name for name in ingest.TABLES if name not in APPEND_ONLY]
+PREFIX_CHECK_BYTES = 64 * 1024
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: str
+    fact: pd.DataFrame
+    cube: cube.Cube
+    sketches: sketch.DistinctSketches = None  # built on first request
+    built_at: float = field(default_factory=time.time)
+
+
+class IncrementalLoader:
+    """Keeps the fact table and its aggregates in step with the data directory.
+
+    ``current`` is replaced, never mutated, so a reader that grabbed it keeps a
+    consistent view while a refresh is in progress.
+    """
+
+    def __init__(self, data_dir=ingest.DATA_DIR, snapshot_dir=ingest.SNAPSHOT_DIR):
+        self.data_dir = data_dir
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        with self._lock:
+            self._rebuild()
+
+    def _stat(self, name):
+        stat = (Path(self.data_dir) / ingest.TABLES[name]).stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def _prefix(self, name, offset):
+        """Hash of the first and last PREFIX_CHECK_BYTES of a feed's first `offset` bytes."""
+        digest = hashlib.sha1()
+        with open(Path(self.data_dir) / ingest.TABLES[name], "rb") as f:
+            digest.update(f.read(min(offset, PREFIX_CHECK_BYTES)))
+            tail = max(offset - PREFIX_CHECK_BYTES, 0)
+            f.seek(tail)
+            digest.update(f.read(offset - tail))
+        return digest.hexdigest()
+
+    def _rewritten(self, name):
+        return self._stat(name)[0] < self._offsets[name] or \
+            self._prefix(name, self._offsets[name]) != self._prefixes[name]
+
+    def _rebuild(self):
+        # Retry if a file changes while we read, so the recorded offsets match
+        # exactly the bytes that were loaded.
+        while True:
+            version = ingest.data_version(self.data_dir)
+            stats = {name: self._stat(name) for name in ingest.TABLES}
+            tables = ingest.load_tables(self.data_dir, self.snapshot_dir)
+            prefixes = {name: self._prefix(name, stats[name][0]) for name in APPEND_ONLY}
+            if ingest.data_version(self.data_dir) == version:
+                break
+        self._offsets = {name: stats[name][0] for name in APPEND_ONLY}
+        self._prefixes = prefixes
+        self._dimension_stats = {name: stats[name] for name in DIMENSION_TABLES}
+        self._projected = fact.project_tables(tables)
+        fact_table = fact.join_orders(self._projected, self._projected["orders"])
+        self.current = Snapshot(version, fact_table, cube.build_cube(fact_table))
+
+    def refresh(self):
+        """Bring ``current`` up to date with the files; True if anything changed."""
+        with self._lock:
+            if any(self._stat(name) != stat for name, stat in self._dimension_stats.items()) or \
+                    any(self._rewritten(name) for name in APPEND_ONLY):
+                self._rebuild()
+                return True
+
+            new_rows = {}
+            for name in APPEND_ONLY:
+                if self._stat(name)[0] == self._offsets[name]:
+                    continue
+                rows, self._offsets[name] = ingest.read_csv_tail(
+                    name, self._offsets[name], self.data_dir)
+                self._prefixes[name] = self._prefix(name, self._offsets[name])
+                if rows is not None and len(rows):
+                    new_rows[name] = rows[fact.COLUMNS[name]]
+            if not new_rows:
+                return False
+            self._apply(new_rows)
+            return True
+
+    def _apply(self, new_rows):
+        for name, rows in new_rows.items():
+            self._projected[name] = fact.concat_frames([self._projected[name], rows])
+
+        affected = pd.unique(pd.concat([rows["Or_ID"] for rows in new_rows.values()]))
+        orders = self._projected["orders"]
+        current = self.current
+        touched = current.fact["Or_ID"].isin(affected).to_numpy()
+        removed = current.fact[touched]
+        added = fact.join_orders(self._projected, orders[orders["Or_ID"].isin(affected)])
+
+        self.current = Snapshot(
+            version=ingest.data_version(self.data_dir),
+            fact=fact.concat_frames([current.fact[~touched], added]),
+            cube=cube.apply_delta(current.cube, removed, added),
+            # Patched orders keep their keys and cells, so only additions matter.
+            sketches=current.sketches.add(added) if current.sketches is not None else None,
+        )
+
+    def sketches(self, snapshot=None, error=sketch.DEFAULT_ERROR):
+        """Distinct-count sketches for `snapshot` (default ``current``), built the
+        first time they are needed.
+
+        Only ``current`` keeps them, so later deltas update them; an older
+        snapshot, still pinned by a reader after a refresh, gets its own.
+        """
+        with self._lock:
+            snapshot = snapshot or self.current
+            if snapshot.sketches is not None and snapshot.sketches.error <= error:
+                return snapshot.sketches
+            sketches = sketch.DistinctSketches(snapshot.fact, error=error)
+            if snapshot is self.current:
+                self.current = replace(self.current, sketches=sketches)
+            return sketches
@@ -0,0 +1,225 @@
+"""Load the AJIO source tables, preferring a typed columnar snapshot.
+
+The raw exports in ``data/`` are CSV. Parsing them as text on every cold start
+is the slowest part of bringing the dashboard up, so this module can convert
+them once into an Arrow/Feather snapshot with explicit dtypes, categorical
+text columns and parsed dates. ``load_tables()`` reads the snapshot
+(memory-mapped) when it matches the current CSVs and falls back to the CSVs
+when it is missing or stale.
+
+Every ID key (C_ID, P_ID, Or_ID, DP_ID) is a fixed prefix plus a dense
+number, e.g. "CS_11005317". ``encode_keys`` stores just the number as an
+int64 (-1 when missing), so joins compare integers instead of hashing
+strings; ``decode_key`` puts the prefix back for display. Orders also get
+their integer time buckets (day, ISO week, month, hour; see ``timebuckets``)
+here, once, instead of per rerun.
+
+Usage:
+    python ingest.py                  # write data/snapshot/ if stale
+    python ingest.py --force          # rewrite it unconditionally
+"""
+import argparse
+import hashlib
+import io
+import json
+from pathlib import Path
+
+import pandas as pd
+
+import timebuckets
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # snapshot support is optional; CSVs always work
+    pa = None
+    feather = None
+
+DATA_DIR = Path("data")
+SNAPSHOT_DIR = DATA_DIR / "snapshot"
+MANIFEST = "manifest.json"
+# Bumped whenever the stored column types change, so older snapshots are stale.
+SNAPSHOT_FORMAT = 3
+
+# table name -> source CSV
+TABLES = {
+    "customers": "customer.csv",
+    "delivery": "delivery.csv",
+    "orders": "orders.csv",
+    "products": "products.csv",
+    "ratings": "ratings.csv",
+    "returns": "returns.csv",
+    "transactions": "transaction.csv",
+}
+
+DTYPES = {
+    "customers": {"C_ID": "string", "C_Name": "string", "Gender": "category", "Age": "int16",
+                  "City": "category", "State": "category", "Street_Address": "string",
+                  "Mobile": "int64"},
+    "delivery": {"DP_ID": "string", "DP_name": "category", "DP_Ratings": "int8",
+                 "Percent_Cut": "int8"},
+    "orders": {"Or_ID": "string", "C_ID": "string", "P_ID": "string", "Order_Time": "string",
+               "Qty": "int16", "Coupon": "category", "DP_ID": "string", "Discount": "int8"},
+    "products": {"P_ID": "string", "P_Name": "string", "Category": "category",
+                 "Company_Name": "category", "Gender": "category", "Price": "int32"},
+    "ratings": {"R_ID": "string", "Or_ID": "string", "Prod_Rating": "int8",
+                "Delivery_Service_Rating": "int8"},
+    "returns": {"RT_ID": "string", "Or_ID": "string", "Reason": "category",
+                "Return_Refund": "category"},
+    "transactions": {"Tr_ID": "string", "Or_ID": "string", "Transaction_Mode": "category",
+                     "Reward": "category"},
+}
+
+DATE_COLUMNS = {
+    "orders": ["Order_Date"],
+    "returns": ["Dates"],
+}
+
+KEY_PREFIXES = {"C_ID": "CS_", "P_ID": "PD_", "Or_ID": "OR_", "DP_ID": "DV_"}
+MISSING_KEY = -1
+
+
+def data_version(data_dir=DATA_DIR):
+    """Fingerprint of the input CSVs; changes whenever any of them is rewritten."""
+    data_dir = Path(data_dir)
+    parts = []
+    for name in TABLES.values():
+        stat = (data_dir / name).stat()
+        parts.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:12]
+
+
+def parse_dates(name, df):
+    for col in DATE_COLUMNS.get(name, []):
+        if col in df:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df
+
+
+def encode_keys(df):
+    """Replace every ID column of `df` by its integer code, in place."""
+    for col, prefix in KEY_PREFIXES.items():
+        if col not in df or pd.api.types.is_integer_dtype(df[col]):
+            continue
+        ids = df[col].astype("string")
+        digits = ids.str.removeprefix(prefix)
+        valid = ids.isna() | (ids.str.startswith(prefix) & digits.str.isdigit())
+        if not valid.all():
+            bad = ids[~valid].iloc[0]
+            raise ValueError(f"{col} {bad!r} is not of the form {prefix}<number>")
+        df[col] = digits.fillna(str(MISSING_KEY)).astype("int64")
+    return df
+
+
+def decode_key(col, codes):
+    """Display IDs ("CS_11005317") for integer codes of key column `col`."""
+    codes = pd.Series(codes)
+    ids = KEY_PREFIXES[col] + codes.astype("string")
+    return ids.mask(codes.to_numpy() == MISSING_KEY).rename(col)
+
+
+def prepare(name, df):
+    """Typed table as the rest of the pipeline expects it: parsed dates, integer
+    keys and, for orders, time buckets."""
+    return timebuckets.add_buckets(encode_keys(parse_dates(name, df)))
+
+
+def read_csv_table(name, data_dir=DATA_DIR):
+    return prepare(name, pd.read_csv(Path(data_dir) / TABLES[name], dtype=DTYPES[name]))
+
+
+def read_csv_tail(name, offset, data_dir=DATA_DIR):
+    """Rows appended to a CSV after byte `offset`, and the offset to resume from.
+
+    Only complete lines are consumed, so a row that is still being written is
+    picked up by the next call.
+    """
+    path = Path(data_dir) / TABLES[name]
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(max(offset, len(header)))
+        chunk = f.read()
+    end = chunk.rfind(b"\n") + 1
+    new_offset = max(offset, len(header)) + end
+    if end == 0:
+        return None, new_offset
+    df = pd.read_csv(io.BytesIO(header + chunk[:end]), dtype=DTYPES[name])
+    return prepare(name, df), new_offset
+
+
+def read_csv_tables(data_dir=DATA_DIR):
+    return {name: read_csv_table(name, data_dir) for name in TABLES}
+
+
+def snapshot_version(snapshot_dir=SNAPSHOT_DIR):
+    """CSV fingerprint the snapshot was built from, or None if there is none
+    (or it was written in an older format)."""
+    path = Path(snapshot_dir) / MANIFEST
+    if not path.exists():
+        return None
+    manifest = json.loads(path.read_text())
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        return None
+    return manifest.get("version")
+
+
+def snapshot_is_fresh(data_dir=DATA_DIR, snapshot_dir=SNAPSHOT_DIR):
+    return feather is not None and snapshot_version(snapshot_dir) == data_version(data_dir)
+
+
+def write_snapshot(data_dir=DATA_DIR, snapshot_dir=SNAPSHOT_DIR, tables=None):
+    """Convert the CSVs into one uncompressed Feather file per table.
+
+    Uncompressed Arrow IPC files can be memory-mapped on load, so reading the
+    snapshot costs little more than the page faults for the columns touched.
+    """
+    if feather is None:
+        raise RuntimeError("pyarrow is required to write a snapshot")
+    version = data_version(data_dir)
+    if tables is None:
+        tables = read_csv_tables(data_dir)
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    for name, df in tables.items():
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        feather.write_feather(table, snapshot_dir / f"{name}.feather", compression="uncompressed")
+    # Written last: a half-written snapshot never looks fresh.
+    manifest = {"version": version, "format": SNAPSHOT_FORMAT,
+                "rows": {name: len(df) for name, df in tables.items()}}
+    (snapshot_dir / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def read_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    snapshot_dir = Path(snapshot_dir)
+    return {
+        name: feather.read_table(snapshot_dir / f"{name}.feather", memory_map=True).to_pandas()
+        for name in TABLES
+    }
+
+
+def load_tables(data_dir=DATA_DIR, snapshot_dir=SNAPSHOT_DIR):
+    """All source tables by name, from the snapshot if it is current."""
+    if snapshot_is_fresh(data_dir, snapshot_dir):
+        return read_snapshot(snapshot_dir)
+    return read_csv_tables(data_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the AJIO CSVs into a columnar snapshot.")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--snapshot-dir", default=str(SNAPSHOT_DIR))
+    parser.add_argument("--force", action="store_true", help="rewrite even if the snapshot is current")
+    args = parser.parse_args()
+
+    if not args.force and snapshot_is_fresh(args.data_dir, args.snapshot_dir):
+        print(f"Snapshot in {args.snapshot_dir} is up to date ({snapshot_version(args.snapshot_dir)}).")
+        return
+    manifest = write_snapshot(args.data_dir, args.snapshot_dir)
+    for name, rows in manifest["rows"].items():
+        print(f"{name:<14}{rows:>12,} rows")
+    print(f"Snapshot {manifest['version']} written to {args.snapshot_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Simulate many dashboard sessions changing filters at the same time.
+
+Starts ``--workers`` processes, the way a multi-process deployment runs
+several Streamlit servers, and spreads ``--sessions`` simulated users over
+them as threads. Each session keeps picking a random filter combination and
+does what a dashboard rerun does for it: the result through the process's
+result cache, then the chart figures. Per-rerun latency and every worker's
+private memory are reported, so the two serving modes can be compared:
+
+* ``private``: every worker loads and aggregates its own copy of the data;
+* ``shared``: every worker attaches the cube published by ``shared.py``.
+
+Usage:
+    python loadtest.py --mode shared --workers 4 --sessions 32 --duration 30
+    python loadtest.py --mode private --workers 4 --data-dir bench_data/1000000
+"""
+import argparse
+import multiprocessing
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import analytics
+import charts
+import incremental
+import ingest
+import result_cache
+import shared
+import tracing
+
+
+def random_spec(rng, source):
+    """A filter a user might pick: a few states, maybe cities, categories and months."""
+    states = rng.sample(source.options("State"), rng.choice([0, 1, 1, 2]))
+    cities = source.options("City", State=states)
+    cities = rng.sample(cities, min(len(cities), rng.choice([0, 0, 1])))
+    categories = rng.sample(source.options("Category"), rng.choice([0, 1, 2]))
+    months = [m for m in source.options("Month") if m != "NaT"]
+    start = end = None
+    if months and rng.random() < 0.5:
+        i, j = sorted(rng.sample(range(len(months)), 2)) if len(months) > 1 else (0, 0)
+        start, end = months[i], months[j]
+    return analytics.FilterSpec(tuple(states), tuple(cities), tuple(categories), start, end)
+
+
+def _load(mode, data_dir, shared_dir):
+    if mode == "shared":
+        return shared.SharedSource(shared_dir).current.value
+    return incremental.IncrementalLoader(data_dir).current.cube
+
+
+def run_worker(worker_id, mode, sessions, duration, think, data_dir, shared_dir, seed):
+    """Serve `sessions` simulated users for `duration` seconds in this process."""
+    before = tracing.private_mb()
+    t0 = time.perf_counter()
+    source = _load(mode, data_dir, shared_dir)
+    load_seconds = time.perf_counter() - t0
+    loaded = tracing.private_mb()
+
+    cache = result_cache.ResultCache()
+    figures = charts.FigureCache()
+    latencies, lock = [], threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def session(session_id):
+        rng = random.Random(seed * 1_000_003 + worker_id * 1000 + session_id)
+        while time.perf_counter() < deadline:
+            spec = random_spec(rng, source)
+            start = time.perf_counter()
+            result = cache.get_or_compute(result_cache.make_key("loadtest", spec, mode),
+                                          lambda: analytics.compute_dashboard(source, spec))
+            for name in analytics.CHARTS:
+                df = getattr(result, name)
+                if len(df):
+                    figures.figure(name, df)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+            if think:
+                time.sleep(rng.expovariate(1 / think))
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "worker": worker_id,
+        "load_seconds": load_seconds,
+        "startup_mb": before,
+        "data_mb": None if before is None else loaded - before,
+        "final_mb": tracing.private_mb(),
+        "latencies": latencies,
+        "cache": cache.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the dashboard with concurrent sessions.")
+    parser.add_argument("--mode", choices=["shared", "private"], default="shared")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=16, help="simulated users in total")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--think", type=float, default=0.0,
+                        help="mean pause between a session's filter changes, in seconds")
+    parser.add_argument("--data-dir", default=str(ingest.DATA_DIR))
+    parser.add_argument("--shared-dir", default=str(shared.SHARED_DIR))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.mode == "shared":
+        loader = incremental.IncrementalLoader(args.data_dir)
+        if shared.current_version(args.shared_dir) != loader.current.version:
+            print(f"Publishing {loader.current.version} to {args.shared_dir} ...")
+            shared.publish(loader.current, args.shared_dir, loader.sketches())
+        del loader
+
+    per_worker = [args.sessions // args.workers + (i < args.sessions % args.workers)
+                  for i in range(args.workers)]
+    # Spawned, not forked: each worker starts empty like a separate server.
+    with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(run_worker, i, args.mode, n, args.duration, args.think,
+                               args.data_dir, args.shared_dir, args.seed)
+                   for i, n in enumerate(per_worker)]
+        reports = [future.result() for future in futures]
+
+    latencies = np.array([x for report in reports for x in report["latencies"]]) * 1000
+    print(f"\n{args.mode}: {args.workers} workers, {args.sessions} sessions, {args.duration:.0f}s")
+    print(f"  {'worker':<8}{'load s':>8}{'data MB':>10}{'final MB':>10}{'reruns':>9}{'hit rate':>10}")
+    for report in reports:
+        data_mb = "-" if report["data_mb"] is None else f"{report['data_mb']:.1f}"
+        final_mb = "-" if report["final_mb"] is None else f"{report['final_mb']:.1f}"
+        print(f"  {report['worker']:<8}{report['load_seconds']:>8.2f}{data_mb:>10}{final_mb:>10}"
+              f"{len(report['latencies']):>9,}{report['cache']['hit_rate']:>10.1%}")
+    if len(latencies):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"  reruns {len(latencies):,} ({len(latencies) / args.duration:,.1f}/s), "
+              f"latency p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Refresh the dashboard's data off the request path.
+
+A ``BackgroundRefresher`` thread polls the data directory and, when the CSVs
+change, builds the next snapshot while sessions keep rendering the previous
+one. The new snapshot replaces the old reference in a single assignment, so
+a rerun sees either the old version or the new one, never a half-built mix,
+and no visitor waits on a reload.
+
+``IncrementalLoader`` already swaps its ``current`` snapshot this way; the
+DuckDB and out-of-core backends are wrapped in a ``VersionedBuilder`` that
+rebuilds them whole.
+
+Usage:
+    python refresher.py --interval 2     # log every refresh of data/
+"""
+import argparse
+import threading
+import time
+from dataclasses import dataclass, field
+
+import incremental
+import ingest
+
+DEFAULT_INTERVAL = 5.0
+
+
+@dataclass(frozen=True)
+class Versioned:
+    version: str
+    value: object
+    built_at: float = field(default_factory=time.time)
+
+
+class VersionedBuilder:
+    """Holds ``build()``'s result for the current data version, rebuilt on change."""
+
+    def __init__(self, build, data_dir=ingest.DATA_DIR):
+        self.build = build
+        self.data_dir = data_dir
+        self._lock = threading.Lock()
+        with self._lock:
+            self.current = self._build()
+
+    def _build(self):
+        # Retry if a file changes mid-build, so the version matches what was read.
+        while True:
+            version = ingest.data_version(self.data_dir)
+            value = self.build()
+            if ingest.data_version(self.data_dir) == version:
+                return Versioned(version, value)
+
+    def refresh(self):
+        """Rebuild if the files changed; True if ``current`` was replaced."""
+        with self._lock:
+            if ingest.data_version(self.data_dir) == self.current.version:
+                return False
+            self.current = self._build()
+            return True
+
+
+class BackgroundRefresher:
+    """Calls ``source.refresh()`` every `interval` seconds on a daemon thread."""
+
+    def __init__(self, source, interval=DEFAULT_INTERVAL, data_dir=ingest.DATA_DIR):
+        self.source = source
+        self.interval = interval
+        self.data_dir = data_dir
+        self.last_check = time.time()
+        self.last_error = None
+        self.refreshes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ajio-refresher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.source.refresh():
+                    self.refreshes += 1
+                self.last_error = None
+            except Exception as exc:  # keep serving the last good snapshot
+                self.last_error = exc
+            self.last_check = time.time()
+
+    def status(self, version):
+        """Freshness of the snapshot with `version`, for display."""
+        try:
+            pending = ingest.data_version(self.data_dir) != version
+        except OSError:
+            pending = False
+        return {
+            "version": version,
+            "checked_seconds_ago": time.time() - self.last_check,
+            "pending": pending,  # the files changed; the next snapshot is being built
+            "error": None if self.last_error is None else str(self.last_error),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch the data directory and log refreshes.")
+    parser.add_argument("--data-dir", default=str(ingest.DATA_DIR))
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL)
+    args = parser.parse_args()
+
+    loader = incremental.IncrementalLoader(args.data_dir)
+    refresher = BackgroundRefresher(loader, args.interval, args.data_dir).start()
+    print(f"Serving {loader.current.version}; watching {args.data_dir} (Ctrl+C to stop)")
+    seen = loader.current.version
+    try:
+        while True:
+            time.sleep(args.interval)
+            snapshot = loader.current
+            if snapshot.version != seen:
+                seen = snapshot.version
+                print(f"{time.strftime('%H:%M:%S')} swapped in {seen} "
+                      f"({snapshot.cube.kpis()['total_orders']:,} orders)")
+            elif refresher.last_error is not None:
+                print(f"{time.strftime('%H:%M:%S')} refresh failed: {refresher.last_error}")
+    except KeyboardInterrupt:
+        refresher.stop()
+
+
+if __name__ == "__main__":
+    main()
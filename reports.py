@@ -0,0 +1,310 @@
+"""Precomputed dashboard reports and a small HTTP API serving them.
+
+Teams that need the dashboard's numbers should not have to drive a
+Streamlit session or rebuild the fact table. ``export`` computes, once per
+run, the KPIs and chart tables of a list of named filter selections (the
+sales charts, the customer segments and the delivery-partner scorecard) and
+writes each as one compact JSON file, optionally with every table as
+Parquet too. ``index.json`` lists the reports with their selection and, per
+file, an ETag: a hash of the file's bytes. The data version is only in the
+index, so a report whose numbers did not change keeps its ETag across
+exports and a client polling it keeps getting 304s.
+
+``serve`` answers from those files held in memory (reloaded when the index
+changes): ``GET /reports`` is the index and ``GET /reports/<file>`` a file
+it lists. Responses carry the ETag, honour ``If-None-Match`` with 304 Not
+Modified, and are gzipped for clients sending ``Accept-Encoding: gzip``.
+
+The selections come from a JSON list of objects with a ``name`` and any
+``analytics.FilterSpec`` fields, e.g.
+``[{"name": "west", "states": ["Maharashtra", "Gujarat"], "start_month": "2024-01"}]``;
+without one, every state and every category is exported, plus "all".
+
+Usage:
+    python reports.py export                                 # data/reports/
+    python reports.py export --config reports.json --parquet
+    python reports.py serve --port 8600
+    curl --compressed localhost:8600/reports/state-maharashtra.json
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+import analytics
+import cube
+import fact
+import ingest
+
+try:
+    import pyarrow  # noqa: F401  (pandas' Parquet engine)
+except ImportError:  # JSON reports do not need it
+    pyarrow = None
+
+REPORTS_DIR = ingest.DATA_DIR / "reports"
+INDEX = "index.json"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8600
+MIN_GZIP_BYTES = 512  # smaller bodies are sent as they are
+CONTENT_TYPES = {".json": "application/json", ".parquet": "application/vnd.apache.parquet"}
+
+
+def slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", str(text).lower()).strip("-")
+
+
+def etag(data):
+    return '"' + hashlib.sha1(data).hexdigest()[:20] + '"'
+
+
+def default_selections(source):
+    """"all", then one selection per state and per category."""
+    selections = {"all": analytics.FilterSpec()}
+    selections.update({f"state-{slug(state)}": analytics.FilterSpec(states=(state,))
+                       for state in source.options("State")})
+    selections.update({f"category-{slug(category)}": analytics.FilterSpec(categories=(category,))
+                       for category in source.options("Category")})
+    return selections
+
+
+def read_selections(path):
+    """Named FilterSpecs from a JSON config file (see the module docstring)."""
+    selections = {}
+    for entry in json.loads(Path(path).read_text()):
+        entry = dict(entry)
+        name = slug(entry.pop("name"))
+        if not name or name in selections:
+            raise ValueError(f"report names must be distinct and non-empty: {name!r}")
+        selections[name] = analytics.FilterSpec(**{
+            key: tuple(value) if isinstance(value, list) else value for key, value in entry.items()})
+    return selections
+
+
+def report(source, spec):
+    """(JSON-serialisable report, {table name: DataFrame}) for one selection."""
+    result = analytics.compute_dashboard(source, spec)
+    customers = analytics.compute_customers(source, spec)
+    partners = analytics.compute_delivery(source, spec)
+    tables = {name: getattr(result, name) for name in analytics.CHARTS}
+    tables["customer_segments"] = customers.segments
+    tables["delivery_partners"] = partners.partners
+    body = {
+        "filters": {key: list(value) if isinstance(value, tuple) else value
+                    for key, value in asdict(spec).items()},
+        **result.to_dict(),
+        "customers": {"kpis": analytics.plain(customers.kpis),
+                      "segments": analytics.records(customers.segments)},
+        "delivery": {"kpis": analytics.plain(partners.kpis),
+                     "partners": analytics.records(partners.partners),
+                     "insights": analytics.plain(partners.insights)},
+    }
+    return body, tables
+
+
+def _write(path, data):
+    """Replace `path` with `data` atomically, so a reader sees the old or the new file."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _parquet(df):
+    buffer = io.BytesIO()
+    df.rename(columns=str).to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def export(source, selections, version, reports_dir=REPORTS_DIR, parquet=False):
+    """Write every selection's report and then the index; returns the index."""
+    reports_dir = Path(reports_dir)
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    index = {"version": version, "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+             "reports": {}}
+    for name, spec in selections.items():
+        body, tables = report(source, spec)
+        files = {"json": (f"{name}.json", json.dumps(body, separators=(",", ":"), default=str).encode())}
+        if parquet:
+            files.update({table: (f"{name}.{table}.parquet", _parquet(df)) for table, df in tables.items()})
+        for path, data in files.values():
+            _write(reports_dir / path, data)
+        index["reports"][name] = {
+            "filters": body["filters"],
+            "files": {key: {"path": path, "etag": etag(data), "bytes": len(data)}
+                      for key, (path, data) in files.items()},
+        }
+    _write(reports_dir / INDEX, json.dumps(index, indent=1).encode())
+    # Files of selections no longer exported, once the index stops listing them.
+    listed = {f["path"] for r in index["reports"].values() for f in r["files"].values()}
+    for path in reports_dir.iterdir():
+        if path.suffix in CONTENT_TYPES and path.name != INDEX and path.name not in listed:
+            path.unlink(missing_ok=True)
+    return index
+
+
+class ReportStore:
+    """The files listed in a reports directory's index, held in memory with
+    their gzipped body and ETag, and reloaded when the index is replaced."""
+
+    def __init__(self, reports_dir=REPORTS_DIR):
+        self.reports_dir = Path(reports_dir)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._files = {}
+
+    def get(self, name):
+        """(body, gzipped body or None, ETag, content type) of file `name`, or None."""
+        self._reload()
+        return self._files.get(name)
+
+    def _reload(self):
+        try:
+            stamp = (self.reports_dir / INDEX).stat().st_mtime_ns
+        except FileNotFoundError:
+            stamp = None
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            files = {}
+            if stamp is not None:
+                index = (self.reports_dir / INDEX).read_bytes()
+                files[INDEX] = _entry(index, CONTENT_TYPES[".json"])
+                for entry in json.loads(index)["reports"].values():
+                    for file in entry["files"].values():
+                        path = self.reports_dir / file["path"]
+                        try:
+                            files[file["path"]] = _entry(path.read_bytes(), CONTENT_TYPES[path.suffix])
+                        except FileNotFoundError:  # removed by an export running now
+                            continue
+            self._files, self._stamp = files, stamp
+
+
+def _entry(data, content_type):
+    # The ETag is of the bytes read, which may be newer than the index's.
+    gzipped = gzip.compress(data, mtime=0) if len(data) >= MIN_GZIP_BYTES else None
+    return data, gzipped, etag(data), content_type
+
+
+def _accepts_gzip(header):
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _matches(header, tag):
+    """If-None-Match `header` matches `tag` or its gzip variant (weak comparison,
+    as the header uses)."""
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = tag.strip('"')
+    return any(candidate.strip().removeprefix("W/").strip('"').removesuffix("-gzip") == bare
+               for candidate in header.split(","))
+
+
+def make_handler(store):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self._serve(send_body=True)
+
+        def do_HEAD(self):
+            self._serve(send_body=False)
+
+        def _serve(self, send_body):
+            path = unquote(urlsplit(self.path).path).rstrip("/")
+            if path == "/reports":
+                name = INDEX
+            elif path.startswith("/reports/"):
+                name = path.removeprefix("/reports/")
+            else:
+                name = None
+            entry = store.get(name) if name else None
+            if entry is None:
+                self.send_error(404, "No such report")
+                return
+            data, gzipped, tag, content_type = entry
+            compress = gzipped is not None and _accepts_gzip(self.headers.get("Accept-Encoding"))
+            # The gzipped body is another representation, so it has another ETag.
+            sent = tag[:-1] + '-gzip"' if compress else tag
+            if _matches(self.headers.get("If-None-Match"), tag):
+                self.send_response(304)
+                self._headers(sent)
+                self.end_headers()
+                return
+            body = gzipped if compress else data
+            self.send_response(200)
+            self._headers(sent)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if compress:
+                self.send_header("Content-Encoding", "gzip")
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+
+        def _headers(self, tag):
+            self.send_header("ETag", tag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Cache-Control", "no-cache")  # revalidate with the ETag
+
+    return Handler
+
+
+def serve(reports_dir=REPORTS_DIR, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), make_handler(ReportStore(reports_dir)))
+    print(f"Serving {reports_dir} on http://{host}:{port}/reports; Ctrl+C to stop", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export precomputed dashboard reports or serve them over HTTP.")
+    parser.add_argument("command", choices=["export", "serve"])
+    parser.add_argument("--data-dir", default=str(ingest.DATA_DIR))
+    parser.add_argument("--reports-dir", default=str(REPORTS_DIR))
+    parser.add_argument("--config", help="JSON list of named selections (default: every state "
+                                         "and category)")
+    parser.add_argument("--parquet", action="store_true", help="also write every table as Parquet")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.reports_dir, args.host, args.port)
+        return
+    if args.parquet and pyarrow is None:
+        parser.error("--parquet needs pyarrow")
+    t0 = time.perf_counter()
+    version = ingest.data_version(args.data_dir)
+    source = cube.build_cube(fact.build_fact_table(ingest.load_tables(args.data_dir)))
+    try:
+        selections = read_selections(args.config) if args.config else default_selections(source)
+    except (KeyError, TypeError, ValueError) as exc:
+        parser.error(f"bad --config: {exc}")
+    t1 = time.perf_counter()
+    index = export(source, selections, version, args.reports_dir, args.parquet)
+    t2 = time.perf_counter()
+    files = [f for r in index["reports"].values() for f in r["files"].values()]
+    print(f"{len(index['reports'])} reports, {len(files)} files, "
+          f"{sum(f['bytes'] for f in files) / 1024:,.0f} KB in {args.reports_dir} "
+          f"(load {t1 - t0:.1f}s, export {t2 - t1:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Process-wide cache of computed dashboard results.
+
+Many sessions open the page with the same few selections (one big state, one
+category, nothing at all), and each of them used to recompute every chart.
+``ResultCache`` keeps the ``analytics.DashboardResult`` for a key made of the
+data version, ``RESULT_FORMAT``, the query backend, the approximate-counts
+flag and the normalised ``FilterSpec``, so neither a new data version nor a
+result pickled by an older build is ever served.
+Keys with a ``view`` hold another result for the same selection instead:
+the sales trend at a granularity ("week"), its forecast ("forecast:week"),
+the customer analytics ("customers") or the delivery partners ("delivery").
+
+Entries are evicted least recently used once the cache holds more than
+``max_entries`` results or ``max_mb`` of chart frames. With ``disk_dir`` set,
+results are also pickled there and read back on a miss, so a restarted
+process does not start cold. Data versions are hashes with no order of
+their own, so the first write of a version also creates a
+``<version>.version`` marker (exclusively, so every process and cache
+writing the directory agrees on it), and the markers' times order the
+versions. Only results of the newest version are written, and writing one
+prunes the files of the others; a session still pinned to an older version
+keeps its results in memory only, so it can never delete a newer version's
+files. A directory must hold only one cache's files.
+
+Usage:
+    python result_cache.py --clear     # remove the on-disk tier
+"""
+import argparse
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+import ingest
+
+CACHE_DIR = ingest.DATA_DIR / "cache"
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_MB = 256
+# Bump when a cached result's fields or numbers change for the same data
+# version, so an upgrade never serves results pickled by the previous build.
+RESULT_FORMAT = 2
+MARKER = ".version"
+KEEP_VERSIONS = 16  # markers kept: far more refreshes than a session stays pinned for
+
+
+def result_mb(result):
+    """Approximate in-memory size of a DataFrame or of the frames of a result
+    such as a DashboardResult."""
+    if isinstance(result, pd.DataFrame):
+        frames = [result]
+    else:
+        frames = [value for value in vars(result).values() if isinstance(value, pd.DataFrame)]
+    return float(sum(df.memory_usage(index=True, deep=True).sum() for df in frames)) / 1e6
+
+
+def make_key(version, spec, backend="pandas", approx=False, view=None):
+    return (version, RESULT_FORMAT, backend, bool(approx), spec.normalised(), view)
+
+
+def _prefix(version):
+    """File name prefix of the results of `version` in the current format."""
+    return f"{version}-r{RESULT_FORMAT}-"
+
+
+class ResultCache:
+    """Thread-safe LRU of DashboardResults with an optional pickle tier."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_mb=DEFAULT_MAX_MB, disk_dir=None):
+        self.max_entries = max_entries
+        self.max_mb = max_mb
+        self.disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self._entries = OrderedDict()  # key -> (result, mb)
+        self._mb = 0.0
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key[1:]).encode()).hexdigest()[:16]
+        return self.disk_dir / f"{_prefix(key[0])}{digest}.pkl"
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+        result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._insert(key, result)
+        return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._insert(key, result)
+        self._write_disk(key, result)
+
+    def get_or_compute(self, key, compute):
+        """Cached result for `key`, calling ``compute()`` on a miss."""
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def _insert(self, key, result):
+        if key in self._entries:
+            self._mb -= self._entries.pop(key)[1]
+        mb = result_mb(result)
+        self._entries[key] = (result, mb)
+        self._mb += mb
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries
+                                          or self._mb > self.max_mb):
+            _, (_, evicted_mb) = self._entries.popitem(last=False)
+            self._mb -= evicted_mb
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                stored_key, result = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            return None
+        return result if stored_key == key else None
+
+    def _versions(self, version):
+        """Mark `version` as written if it is new; every marked version, oldest first."""
+        try:
+            (self.disk_dir / f"{version}{MARKER}").open("x").close()
+        except FileExistsError:
+            pass
+        marked = []
+        for marker in self.disk_dir.glob(f"*{MARKER}"):
+            try:
+                marked.append((marker.stat().st_mtime_ns, marker.name))
+            except FileNotFoundError:  # dropped by another writer
+                continue
+        return [name.removesuffix(MARKER) for _, name in sorted(marked)]
+
+    def _write_disk(self, key, result):
+        if self.disk_dir is None:
+            return
+        version = key[0]
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        versions = self._versions(version)
+        if versions[-1] != version:
+            return  # a session pinned to an older version; its results go stale
+        # Results of older data versions or formats can never be served again.
+        for stale in self.disk_dir.glob("*.pkl"):
+            if not stale.name.startswith(_prefix(version)):
+                stale.unlink(missing_ok=True)
+        for old in versions[:-KEEP_VERSIONS]:
+            (self.disk_dir / f"{old}{MARKER}").unlink(missing_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump((key, result), f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._entries.clear()
+            self._mb = 0.0
+        if disk and self.disk_dir is not None and self.disk_dir.exists():
+            for path in self.disk_dir.rglob("*.pkl"):  # the forecasts' directory too
+                path.unlink(missing_ok=True)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "mb": round(self._mb, 2),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the on-disk dashboard result cache.")
+    parser.add_argument("--cache-dir", default=str(CACHE_DIR))
+    parser.add_argument("--clear", action="store_true", required=True)
+    args = parser.parse_args()
+
+    ResultCache(disk_dir=args.cache_dir).clear(disk=True)
+    print(f"Cleared {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
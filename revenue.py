@@ -0,0 +1,73 @@
+"""Net revenue: what is left of the gross after discounts, refunds and the
+delivery partner's cut.
+
+``Total`` (Qty x Price) is the gross. ``add_amounts`` adds, once per order
+when the fact table is built:
+
+* Discounts: the order's ``Discount`` percent (its coupon's) of the gross;
+* Refunds: the discounted price, if the order's latest return was Approved;
+* Logistics: the delivery partner's ``Percent_Cut`` of the discounted price;
+
+so Net = Gross - Discounts - Refunds - Logistics. A refund is booked in the
+month of the return's ``Dates``, not in the order month: ``booked`` turns
+fact rows into bookings keyed by the month they fall in, from which the cube
+keeps a per-month revenue table. The waterfall is then a roll-up of that
+table like any other chart, with no per-rerun cost.
+"""
+import numpy as np
+import pandas as pd
+
+import timebuckets
+
+MEASURES = ["Gross", "Discounts", "Refunds", "Logistics", "Net"]
+# Source columns add_amounts reads and then drops.
+INPUTS = ["Discount", "Percent_Cut", "Return_Refund", "Dates"]
+REFUNDED = "Approved"
+
+
+def add_amounts(fact):
+    """`fact` with Discounts, Refunds, Logistics and Refund_Month (the return's
+    ``Order_Month``-style code, MISSING unless refunded) instead of INPUTS."""
+    gross = fact["Total"].to_numpy(dtype="float64")
+    discounts = gross * fact["Discount"].to_numpy(dtype="float64", na_value=0) / 100
+    paid = gross - discounts
+    refunded = (fact["Return_Refund"] == REFUNDED).fillna(False).to_numpy(dtype=bool)
+    cut = fact["Percent_Cut"].to_numpy(dtype="float64", na_value=0)
+    months = fact["Dates"].to_numpy().astype("datetime64[M]")
+    fact["Discounts"] = discounts
+    fact["Refunds"] = np.where(refunded, paid, 0.0)
+    fact["Logistics"] = paid * cut / 100
+    fact["Refund_Month"] = np.where(refunded & ~np.isnat(months), months.astype("int64"),
+                                    timebuckets.MISSING).astype("int32")
+    return fact.drop(columns=INPUTS)
+
+
+def booked(fact, dims):
+    """Revenue MEASURES per `dims` (which include Month) and booking month.
+
+    Gross, Discounts and Logistics are booked in the order's Month, Refunds
+    in the month of the return; Net is what remains in each.
+    """
+    sales = fact[dims].assign(Gross=fact["Total"].astype("float64"), Discounts=fact["Discounts"],
+                              Refunds=0.0, Logistics=fact["Logistics"], Rows=1)
+    refunds = fact[fact["Refunds"] > 0]
+    refunds = refunds[dims].assign(
+        Month=timebuckets.month_labels(refunds["Refund_Month"].to_numpy()),
+        Gross=0.0, Discounts=0.0, Refunds=refunds["Refunds"], Logistics=0.0, Rows=1)
+    rows = pd.concat([sales, refunds], ignore_index=True)
+    rows["Month"] = rows["Month"].astype("category")  # order and refund months together
+    rows["Net"] = rows["Gross"] - rows["Discounts"] - rows["Refunds"] - rows["Logistics"]
+    return (rows.groupby(dims, observed=True, dropna=False)[MEASURES + ["Rows"]].sum()
+            .reset_index())
+
+
+def waterfall(totals):
+    """(Step, Amount, Measure) rows of the gross-to-net waterfall for a
+    Series of MEASURES totals; Measure is how plotly draws the step."""
+    return pd.DataFrame({
+        "Step": ["Gross", "Discounts", "Refunds", "Logistics", "Net"],
+        "Amount": [totals["Gross"], -totals["Discounts"], -totals["Refunds"],
+                   -totals["Logistics"], totals["Net"]],
+        "Measure": ["absolute", "relative", "relative", "relative", "total"],
+    })
+
@@ -0,0 +1,245 @@
+"""Serve one copy of the cube to many dashboard processes.
+
+A single Streamlit process can only use one core, so a busy deployment runs
+several of them behind a load balancer, and each used to load, merge and
+aggregate its own copy of the data. In shared mode one loader process
+publishes the cube instead: every table as an uncompressed Arrow IPC file in
+a single record batch, the filter-index postings and the distinct-count
+sketch registers as ``.npy`` arrays, all under ``data/shared/<version>/``.
+Workers memory-map those files read-only and build their DataFrames as views
+over the mapping, so the pages are shared through the OS page cache and a
+worker's private memory does not grow with the data.
+
+The loader writes each new data version to its own directory and then
+replaces the ``CURRENT`` pointer, so a worker attaches either the old version
+or the new one. The previous version is kept for workers still reading it.
+
+Usage:
+    python shared.py publish                 # publish data/, then every change
+    python shared.py serve --workers 4       # publisher + 4 app workers (ports 8501-8504)
+    AJIO_SHARED_DIR=data/shared streamlit run app.py    # one worker by hand
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import cube
+import incremental
+import ingest
+import refresher
+import sketch
+from filter_index import FilterIndex
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # shared mode needs pyarrow; the other modes do not
+    pa = None
+    feather = None
+
+SHARED_DIR = ingest.DATA_DIR / "shared"
+POINTER = "CURRENT"
+KEEP_VERSIONS = 2  # the current one and the one workers may still be reading
+DEFAULT_BASE_PORT = 8501
+
+
+def _write_frame(df, path):
+    # One record batch, so every column maps back as a single contiguous array.
+    feather.write_feather(df, path, compression="uncompressed", chunksize=max(len(df), 1))
+
+
+def _read_frame(path):
+    """DataFrame whose columns are views over the memory-mapped IPC file."""
+    table = feather.read_table(path, memory_map=True)
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+        if pa.types.is_dictionary(array.type) and array.null_count == 0:
+            # Categories stay Arrow-backed strings rather than Python objects.
+            categories = pd.Index(array.dictionary.to_pandas())
+            columns[name] = pd.Categorical.from_codes(
+                array.indices.to_numpy(zero_copy_only=False), validate=False,
+                dtype=pd.CategoricalDtype(categories, array.type.ordered))
+        elif array.null_count == 0 and pa.types.is_primitive(array.type):
+            columns[name] = array.to_numpy(zero_copy_only=False)
+        else:  # nulls need pandas' own representation, which is a copy
+            columns[name] = array.to_pandas()
+    return pd.DataFrame(columns, copy=False)
+
+
+def publish(snapshot, shared_dir=SHARED_DIR, sketches=None):
+    """Write `snapshot`'s cube (and `sketches`) and point ``CURRENT`` at it."""
+    shared_dir = Path(shared_dir)
+    target = shared_dir / snapshot.version
+    tmp = shared_dir / f".{snapshot.version}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    manifest = {"version": snapshot.version, "built_at": snapshot.built_at,
+                "format": ingest.SNAPSHOT_FORMAT, "rows": {}}
+    for name in cube.TABLES:
+        df = getattr(snapshot.cube, name)
+        _write_frame(df, tmp / f"{name}.arrow")
+        manifest["rows"][name] = len(df)
+        positions, offsets = snapshot.cube.indexes[name].arrays()
+        for dim in cube.FILTER_DIMENSIONS:
+            np.save(tmp / f"{name}.{dim}.positions.npy", positions[dim])
+            np.save(tmp / f"{name}.{dim}.offsets.npy", offsets[dim])
+    if sketches is not None:
+        _write_frame(sketches.cells, tmp / "sketch_cells.arrow")
+        for col, registers in sketches.registers.items():
+            np.save(tmp / f"sketch.{col}.npy", registers)
+        manifest["sketches"] = {"p": sketches.p, "columns": list(sketches.registers)}
+    (tmp / ingest.MANIFEST).write_text(json.dumps(manifest, indent=2))
+
+    shutil.rmtree(target, ignore_errors=True)
+    tmp.rename(target)
+    pointer = shared_dir / f".{POINTER}.tmp"
+    pointer.write_text(snapshot.version)
+    pointer.replace(shared_dir / POINTER)
+
+    # Workers keep their mappings of an unlinked version until they let go.
+    versions = sorted((p for p in shared_dir.iterdir() if p.is_dir() and not p.name.startswith(".")),
+                      key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in versions[KEEP_VERSIONS:]:
+        shutil.rmtree(stale, ignore_errors=True)
+    return manifest
+
+
+def current_version(shared_dir=SHARED_DIR):
+    try:
+        return (Path(shared_dir) / POINTER).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def attach(version, shared_dir=SHARED_DIR):
+    """The published cube of `version`, memory-mapped read-only."""
+    root = Path(shared_dir) / version
+    manifest = json.loads((root / ingest.MANIFEST).read_text())
+    tables, indexes = {}, {}
+    for name in cube.TABLES:
+        df = _read_frame(root / f"{name}.arrow")
+        positions = {dim: np.load(root / f"{name}.{dim}.positions.npy", mmap_mode="r")
+                     for dim in cube.FILTER_DIMENSIONS}
+        offsets = {dim: np.load(root / f"{name}.{dim}.offsets.npy")
+                   for dim in cube.FILTER_DIMENSIONS}
+        tables[name] = df
+        indexes[name] = FilterIndex.attach(df, cube.FILTER_DIMENSIONS, positions, offsets)
+    return refresher.Versioned(version, cube.Cube(**tables, indexes=indexes),
+                               manifest["built_at"])
+
+
+def attach_sketches(version, shared_dir=SHARED_DIR):
+    """The published distinct-count sketches of `version`, or None."""
+    root = Path(shared_dir) / version
+    manifest = json.loads((root / ingest.MANIFEST).read_text())
+    if "sketches" not in manifest:
+        return None
+    registers = {col: np.load(root / f"sketch.{col}.npy", mmap_mode="r")
+                 for col in manifest["sketches"]["columns"]}
+    return sketch.DistinctSketches.from_registers(
+        _read_frame(root / "sketch_cells.arrow"), registers, manifest["sketches"]["p"])
+
+
+class SharedSource:
+    """Data source of a worker: the version ``CURRENT`` points at.
+
+    Same interface as the other sources (``current``, ``refresh()``), so the
+    dashboard's ``BackgroundRefresher`` picks up each publish.
+    """
+
+    def __init__(self, shared_dir=SHARED_DIR, wait=60.0):
+        self.shared_dir = Path(shared_dir)
+        self._lock = threading.Lock()
+        deadline = time.time() + wait
+        while current_version(self.shared_dir) is None:  # the publisher may still be starting
+            if time.time() > deadline:
+                raise FileNotFoundError(f"nothing published in {self.shared_dir}; "
+                                        f"run `python shared.py publish`")
+            time.sleep(0.5)
+        self.current = attach(current_version(self.shared_dir), self.shared_dir)
+
+    def refresh(self):
+        with self._lock:
+            version = current_version(self.shared_dir)
+            if version is None or version == self.current.version:
+                return False
+            self.current = attach(version, self.shared_dir)
+            return True
+
+
+def publish_forever(data_dir, shared_dir, interval, sketches=True, stop=None):
+    loader = incremental.IncrementalLoader(data_dir)
+    stop = stop or threading.Event()
+    while True:
+        snapshot = loader.current
+        t0 = time.perf_counter()
+        publish(snapshot, shared_dir, loader.sketches() if sketches else None)
+        print(f"{time.strftime('%H:%M:%S')} published {snapshot.version} "
+              f"({snapshot.cube.kpis()['total_orders']:,} orders) in "
+              f"{time.perf_counter() - t0:.2f}s", flush=True)
+        while not loader.refresh():
+            if stop.wait(interval):
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish the cube for shared-memory dashboard workers.")
+    parser.add_argument("command", choices=["publish", "serve"])
+    parser.add_argument("--data-dir", default=str(ingest.DATA_DIR))
+    parser.add_argument("--shared-dir", default=str(SHARED_DIR))
+    parser.add_argument("--interval", type=float, default=refresher.DEFAULT_INTERVAL)
+    parser.add_argument("--no-sketches", action="store_true",
+                        help="do not publish distinct-count sketches")
+    parser.add_argument("--workers", type=int, default=2, help="app processes for `serve`")
+    parser.add_argument("--base-port", type=int, default=DEFAULT_BASE_PORT)
+    args = parser.parse_args()
+
+    if feather is None:
+        parser.error("shared mode needs pyarrow")
+    if args.command == "publish":
+        try:
+            publish_forever(args.data_dir, args.shared_dir, args.interval, not args.no_sketches)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    # Stopping `serve` (Ctrl+C or SIGTERM) stops its workers too.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    stop = threading.Event()
+    publisher = threading.Thread(target=publish_forever, daemon=True,
+                                 args=(args.data_dir, args.shared_dir, args.interval,
+                                       not args.no_sketches, stop))
+    publisher.start()
+    env = {**os.environ, "AJIO_SHARED_DIR": args.shared_dir}
+    app = Path(__file__).with_name("app.py")
+    workers = [subprocess.Popen([sys.executable, "-m", "streamlit", "run", str(app),
+                                 "--server.port", str(args.base_port + i),
+                                 "--server.headless", "true"], env=env)
+               for i in range(args.workers)]
+    print(f"Workers on ports {args.base_port}-{args.base_port + args.workers - 1} "
+          f"(put a load balancer in front); Ctrl+C to stop", flush=True)
+    try:
+        for worker in workers:
+            worker.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""HyperLogLog sketches for approximate distinct counts.
+
+Distinct orders and customers are not additive, so an exact count for a
+filter combination needs a scan of the matching keys. Here every
+(State, City, Category, Month) cell instead stores one HyperLogLog register
+array per key column. Sketches merge by taking the element-wise maximum, so
+the distinct count for any filter is the estimate of the merged registers of
+the selected cells, independent of the number of orders.
+
+Usage:
+    python sketch.py --rows 1000000   # exact vs approximate on synthetic data
+"""
+import argparse
+import copy
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from filter_index import FilterIndex
+
+CELL_DIMENSIONS = ["State", "City", "Category", "Month"]
+DEFAULT_ERROR = 0.02
+
+
+def precision_for(error):
+    """Smallest register-count exponent whose relative standard error is within `error`."""
+    return min(max(math.ceil(2 * math.log2(1.04 / error)), 4), 16)
+
+
+def _bit_length(w):
+    w = w.copy()
+    n = np.zeros(len(w), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = w >= np.uint64(1 << shift)
+        n[big] += shift
+        w[big] >>= np.uint64(shift)
+    return n + (w > 0)
+
+
+def _hash(keys):
+    # Hash each distinct category once instead of every row's string.
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        return pd.util.hash_array(keys.cat.categories.to_numpy(dtype=object))[keys.cat.codes.to_numpy()]
+    if pd.api.types.is_integer_dtype(keys):  # encoded ID keys
+        return pd.util.hash_array(keys.to_numpy(dtype="int64"))
+    return pd.util.hash_array(keys.to_numpy(dtype=object))
+
+
+def _registers(groups, n_groups, keys, p):
+    """HLL registers, one row per group, for the keys in each group."""
+    h = _hash(keys)
+    idx = (h >> np.uint64(64 - p)).astype(np.int64)
+    rest = h & np.uint64((1 << (64 - p)) - 1)
+    rank = (64 - p) - _bit_length(rest).astype(np.int64) + 1
+
+    m = 1 << p
+    registers = np.zeros((n_groups, m), dtype=np.uint8)
+    flat = pd.Series(rank).groupby(groups.astype(np.int64) * m + idx).max()
+    registers.reshape(-1)[flat.index.to_numpy()] = flat.to_numpy()
+    return registers
+
+
+def estimate(registers):
+    """Cardinality estimate for one register array."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = np.count_nonzero(registers == 0)
+    if raw <= 2.5 * m and zeros:
+        return m * math.log(m / zeros)
+    return raw
+
+
+def _cell_keys(cells):
+    return cells[CELL_DIMENSIONS].astype(str).agg("\x1f".join, axis=1)
+
+
+class DistinctSketches:
+    """Mergeable distinct-count sketches per (State, City, Category, Month) cell."""
+
+    def __init__(self, fact, columns=("Or_ID", "C_ID"), error=DEFAULT_ERROR):
+        self.p = precision_for(error)
+        self.error = 1.04 / math.sqrt(1 << self.p)
+        grouped = fact.groupby(CELL_DIMENSIONS, observed=True, dropna=False)
+        groups = grouped.ngroup().to_numpy()
+        self.cells = grouped.size().reset_index()[CELL_DIMENSIONS]
+        self.index = FilterIndex(self.cells, CELL_DIMENSIONS)
+        self.registers = {col: _registers(groups, len(self.cells), fact[col], self.p)
+                          for col in columns}
+
+    @classmethod
+    def from_registers(cls, cells, registers, p):
+        """Sketches over `cells` with the given register matrices (e.g. memory-mapped)."""
+        out = cls.__new__(cls)
+        out.p = p
+        out.error = 1.04 / math.sqrt(1 << p)
+        out.cells = cells
+        out.index = FilterIndex(cells, CELL_DIMENSIONS)
+        out.registers = dict(registers)
+        return out
+
+    def add(self, fact):
+        """Sketches that also cover new fact rows; registers only ever grow.
+
+        Returns a new object so readers of this one never see a half update.
+        """
+        grouped = fact.groupby(CELL_DIMENSIONS, observed=True, dropna=False)
+        groups = grouped.ngroup().to_numpy()
+        cells = grouped.size().reset_index()[CELL_DIMENSIONS]
+        rows = pd.Index(_cell_keys(self.cells)).get_indexer(_cell_keys(cells))
+        new = rows < 0
+        rows[new] = len(self.cells) + np.arange(new.sum())
+
+        out = copy.copy(self)
+        if new.any():
+            out.cells = pd.concat([self.cells, cells[new]], ignore_index=True)
+            out.index = FilterIndex(out.cells, CELL_DIMENSIONS)
+        out.registers = {}
+        for col, registers in self.registers.items():
+            padding = np.zeros((new.sum(), registers.shape[1]), dtype=np.uint8)
+            registers = np.vstack([registers, padding])
+            delta = _registers(groups, len(cells), fact[col], self.p)
+            registers[rows] = np.maximum(registers[rows], delta)
+            out.registers[col] = registers
+        return out
+
+    def count(self, column, states=None, cities=None, categories=None, months=None):
+        rows = self.index.rows({"State": states, "City": cities, "Category": categories,
+                                "Month": months})
+        registers = self.registers[column]
+        if rows is not None:
+            if len(rows) == 0:
+                return 0
+            registers = registers[rows]
+        return int(round(estimate(registers.max(axis=0))))
+
+    def memory_mb(self):
+        return sum(r.nbytes for r in self.registers.values()) / 2**20
+
+
+def synthetic_fact(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    n_customers = max(n_rows // 3, 1)
+    cities = pd.DataFrame({"City": [f"City_{i}" for i in range(20)],
+                           "State": [f"State_{i // 2}" for i in range(20)]})
+    customer_city = rng.integers(0, 20, n_customers)
+    c_idx = rng.zipf(1.3, n_rows) % n_customers
+    return pd.DataFrame({
+        "Or_ID": np.arange(31000001, 31000001 + n_rows, dtype=np.int32),
+        "C_ID": (11000001 + c_idx).astype(np.int32),
+        "State": pd.Categorical(cities["State"].to_numpy()[customer_city[c_idx]]),
+        "City": pd.Categorical(cities["City"].to_numpy()[customer_city[c_idx]]),
+        "Category": pd.Categorical(rng.choice([f"Cat_{i}" for i in range(10)], n_rows)),
+        "Month": pd.Categorical(rng.choice([f"2024-{m:02d}" for m in range(1, 13)], n_rows)),
+    })
+
+
+def benchmark(n_rows, error=DEFAULT_ERROR, repeats=20, seed=0):
+    fact = synthetic_fact(n_rows, seed)
+    t0 = time.perf_counter()
+    sketches = DistinctSketches(fact, error=error)
+    build = time.perf_counter() - t0
+
+    rng = np.random.default_rng(seed + 1)
+    states = sorted(fact["State"].cat.categories)
+    categories = sorted(fact["Category"].cat.categories)
+    exact_time = approx_time = 0.0
+    worst = 0.0
+    for _ in range(repeats):
+        sel_states = list(rng.choice(states, rng.integers(0, 4), replace=False))
+        sel_categories = list(rng.choice(categories, rng.integers(0, 3), replace=False))
+        t0 = time.perf_counter()
+        subset = fact
+        if sel_states:
+            subset = subset[subset["State"].isin(sel_states)]
+        if sel_categories:
+            subset = subset[subset["Category"].isin(sel_categories)]
+        exact = {col: subset[col].nunique() for col in ("Or_ID", "C_ID")}
+        exact_time += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        approx = {col: sketches.count(col, sel_states, None, sel_categories)
+                  for col in ("Or_ID", "C_ID")}
+        approx_time += time.perf_counter() - t0
+        for col in exact:
+            if exact[col]:
+                worst = max(worst, abs(approx[col] - exact[col]) / exact[col])
+
+    return {
+        "rows": n_rows,
+        "precision": sketches.p,
+        "standard_error": sketches.error,
+        "sketch_mb": sketches.memory_mb(),
+        "build_s": build,
+        "exact_ms": exact_time / repeats * 1000,
+        "approx_ms": approx_time / repeats * 1000,
+        "max_relative_error": worst,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare exact and HyperLogLog distinct counts.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--error", type=float, default=DEFAULT_ERROR)
+    args = parser.parse_args()
+    for n_rows in args.rows:
+        result = benchmark(n_rows, args.error)
+        print("  ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}"
+                        for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Out-of-core aggregation for order volumes that do not fit in memory.
+
+The fact table is never materialised. The order feeds (orders, ratings,
+returns, transactions) are read in chunks and hash-partitioned on Or_ID into
+spill files, so every row of an order lands in the same partition. Each
+partition is then joined against the in-memory dimension tables (customers,
+products, delivery) and folded into the cube, which is all the dashboard
+renders from. Peak memory is one partition plus the dimension tables plus
+the running cube.
+
+Usage:
+    python streaming.py --chunk-rows 500000
+"""
+import argparse
+import math
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import cube
+import fact
+import ingest
+import sketch
+import timebuckets
+
+FEEDS = ["orders", "ratings", "returns", "transactions"]
+DIMENSIONS = ["customers", "products", "delivery"]
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def _partition_count(data_dir, chunk_rows):
+    """Enough partitions that one holds about `chunk_rows` orders."""
+    path = Path(data_dir) / ingest.TABLES["orders"]
+    with open(path, "rb") as f:
+        f.readline()
+        sample = f.read(1 << 20)
+    lines = max(sample.count(b"\n"), 1)
+    approx_rows = path.stat().st_size / (len(sample) / lines) if sample else 0
+    return max(1, math.ceil(approx_rows / chunk_rows))
+
+
+def _spill(data_dir, spill_dir, n_partitions, chunk_rows):
+    for name in FEEDS:
+        chunks = pd.read_csv(Path(data_dir) / ingest.TABLES[name], dtype=ingest.DTYPES[name],
+                             usecols=timebuckets.source_columns(fact.COLUMNS[name]),
+                             chunksize=chunk_rows)
+        for i, chunk in enumerate(chunks):
+            chunk = ingest.prepare(name, chunk)[fact.COLUMNS[name]]
+            part = pd.util.hash_array(chunk["Or_ID"].to_numpy()) % n_partitions
+            for p, rows in chunk.groupby(part):
+                rows.to_pickle(Path(spill_dir) / f"{name}-{p:05d}-{i:06d}.pkl")
+
+
+def _read_partition(spill_dir, name, p, empty):
+    files = sorted(Path(spill_dir).glob(f"{name}-{p:05d}-*.pkl"))
+    return fact.concat_frames([pd.read_pickle(f) for f in files]) if files else empty
+
+
+def iter_fact_partitions(data_dir=ingest.DATA_DIR, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield the fact table one Or_ID hash partition at a time."""
+    dims = {name: ingest.read_csv_table(name, data_dir)[fact.COLUMNS[name]] for name in DIMENSIONS}
+    empty = {name: ingest.prepare(name, pd.DataFrame({
+                 col: pd.Series(dtype=ingest.DTYPES[name].get(col, "datetime64[ns]"))
+                 for col in timebuckets.source_columns(fact.COLUMNS[name])}))[fact.COLUMNS[name]]
+             for name in FEEDS}
+    n_partitions = _partition_count(data_dir, chunk_rows)
+    with tempfile.TemporaryDirectory(prefix="ajio-spill-") as spill_dir:
+        _spill(data_dir, spill_dir, n_partitions, chunk_rows)
+        for p in range(n_partitions):
+            tables = dict(dims)
+            for name in FEEDS:
+                tables[name] = _read_partition(spill_dir, name, p, empty[name])
+            if len(tables["orders"]):
+                yield fact.join_orders(tables, tables["orders"])
+
+
+def build_cube(data_dir=ingest.DATA_DIR, chunk_rows=DEFAULT_CHUNK_ROWS):
+    tables = None
+    for rows in iter_fact_partitions(data_dir, chunk_rows):
+        part = cube.aggregate(rows)
+        tables = part if tables is None else cube.combine([tables, part])
+    return cube.from_tables(tables)
+
+
+def build_sketches(data_dir=ingest.DATA_DIR, chunk_rows=DEFAULT_CHUNK_ROWS,
+                   error=sketch.DEFAULT_ERROR):
+    sketches = None
+    for rows in iter_fact_partitions(data_dir, chunk_rows):
+        sketches = (sketch.DistinctSketches(rows, error=error) if sketches is None
+                    else sketches.add(rows))
+    return sketches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the dashboard cube out of core.")
+    parser.add_argument("--data-dir", default=str(ingest.DATA_DIR))
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    result = build_cube(args.data_dir, args.chunk_rows)
+    kpis = result.kpis()
+    print(f"{len(result.cells):,} cells in {time.perf_counter() - t0:.2f}s")
+    for name, value in kpis.items():
+        print(f"{name:<18}{value:>16,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Generate schema-faithful AJIO exports at any scale for benchmarking.
+
+Writes the same seven CSVs as ``data/`` with the same columns, ID formats and
+value domains. Keys are skewed the way real traffic is: a few states, cities,
+customers and products account for a large share of orders, while ratings
+and transactions reference orders with replacement (so some orders have
+several rows, as in the sample) and about a fifth of orders are returned.
+
+Usage:
+    python synthetic.py --orders 1000000 --out bench_data/1m
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CITIES = {
+    "Mumbai": "Maharashtra", "Pune": "Maharashtra", "Thane": "Maharashtra",
+    "Nagpur": "Maharashtra", "Delhi": "Delhi", "Bengaluru": "Karnataka",
+    "Hyderabad": "Telangana", "Chennai": "Tamil Nadu", "Ahmedabad": "Gujarat",
+    "Surat": "Gujarat", "Vadodara": "Gujarat", "Kolkata": "West Bengal",
+    "Lucknow": "Uttar Pradesh", "Kanpur": "Uttar Pradesh", "Ghaziabad": "Uttar Pradesh",
+    "Jaipur": "Rajasthan", "Indore": "Madhya Pradesh", "Bhopal": "Madhya Pradesh",
+    "Patna": "Bihar", "Visakhapatnam": "Andhra Pradesh",
+}
+FIRST_NAMES = ["Aarav", "Radhika", "Manbir", "Chandresh", "Logan", "Ishita", "Kabir",
+               "Meera", "Rohan", "Sana", "Vikram", "Ananya", "Arjun", "Priya", "Zoya"]
+LAST_NAMES = ["Lala", "More", "Halder", "Dugar", "Soni", "Sharma", "Iyer", "Reddy",
+              "Patel", "Das", "Khan", "Mehta", "Nair", "Kapoor", "Joshi"]
+STREETS = ["Park Ave", "Elm St", "MG Road", "Station Rd", "Lake View", "Hill Rd"]
+CATEGORIES = ["Jeans", "Blazer", "Hoodie", "Shirt", "Dress", "Skirt", "Shorts", "T-Shirt",
+              "Jacket", "Sweater"]
+STYLES = ["Slim Fit", "Relaxed", "Cropped", "Formal", "Oversized", "Midi", "Pullover"]
+FABRICS = ["Cotton", "Denim", "Silk", "Linen", "Wool", "Cotton Blend", "Chiffon"]
+COLOURS = ["Black", "Navy Blue", "Charcoal", "Olive Green", "Beige", "Light Blue", "Brown"]
+PATTERNS = ["Solid", "Striped", "Checkered", "Faded", "Textured", "Polka Dot"]
+COMPANIES = ["Puma", "Gap", "Reebok", "Levi's", "H&M", "Zara", "Pantaloons", "Nike",
+             "Adidas", "Uniqlo"]
+COUPONS = ["SAVE", "FESTIVE", "WELCOME", "BONUS", "EXTRA", "FLAT", "PULL", "TALK"]
+DISCOUNTS = [5, 10, 12, 15, 17, 20, 25, 30, 35, 40, 45, 50]
+MODES = ["Net Banking", "Debit Card", "Credit Card", "UPI", "Wallet"]
+REASONS = ["Defective Product", "Wrong Item Shipped", "Late Delivery"]
+DELIVERY = pd.DataFrame({
+    "DP_ID": [f"DV_{61000001 + i}" for i in range(5)],
+    "DP_name": ["Delhivery", "Ecom Express", "Blue Dart", "Xpressbees", "Shadowfax"],
+    "DP_Ratings": [5, 4, 4, 4, 3],
+    "Percent_Cut": [25, 20, 25, 20, 15],
+})
+START, DAYS = np.datetime64("2023-01-01"), 731
+
+
+def _ids(prefix, start, n):
+    return prefix + pd.Series(np.arange(start, start + n)).astype(str)
+
+
+def _skewed(rng, n_values, size, power):
+    """Indices in [0, n_values) where low indices are drawn far more often."""
+    return np.minimum((n_values * rng.random(size) ** power).astype(np.int64), n_values - 1)
+
+
+def _pick(rng, values, size):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), size)]
+
+
+def _dates(rng, size):
+    return pd.Series(START + rng.integers(0, DAYS, size).astype("timedelta64[D]")).dt.strftime("%Y-%m-%d")
+
+
+def customers(rng, n):
+    city_names = np.array(list(CITIES), dtype=object)
+    city = city_names[_skewed(rng, len(city_names), n, 1.6)]
+    state = pd.Series(city).map(CITIES)
+    names = pd.Series(_pick(rng, FIRST_NAMES, n)) + " " + _pick(rng, LAST_NAMES, n)
+    street = (pd.Series(_pick(rng, STREETS, n)) + ", " + rng.integers(1, 999, n).astype(str)
+              + " , " + city + " , " + state + " - " + rng.integers(100000, 999999, n).astype(str))
+    return pd.DataFrame({
+        "C_ID": _ids("CS_", 11000001, n), "C_Name": names,
+        "Gender": _pick(rng, ["Male", "Female"], n), "Age": rng.integers(18, 71, n),
+        "City": city, "State": state, "Street_Address": street,
+        "Mobile": rng.integers(6_000_000_000, 9_999_999_999, n),
+    })
+
+
+def products(rng, n):
+    category = _pick(rng, CATEGORIES, n)
+    name = (pd.Series(_pick(rng, STYLES, n)) + " " + _pick(rng, FABRICS, n) + " "
+            + _pick(rng, COLOURS, n) + " " + _pick(rng, PATTERNS, n) + " " + category)
+    return pd.DataFrame({
+        "P_ID": _ids("PD_", 21000001, n), "P_Name": name, "Category": category,
+        "Company_Name": _pick(rng, COMPANIES, n), "Gender": _pick(rng, ["Unisex", "Men", "Women"], n),
+        "Price": rng.integers(500, 3001, n),
+    })
+
+
+def orders(rng, start, n, n_customers, n_products):
+    coupon = np.where(rng.random(n) < 0.5, "No Coupon", _pick(rng, COUPONS, n))
+    discount = np.where(coupon == "No Coupon", 0, _pick(rng, DISCOUNTS, n))
+    seconds = rng.integers(0, 86400, n)
+    return pd.DataFrame({
+        "Or_ID": _ids("OR_", 31000001 + start, n),
+        "C_ID": "CS_" + pd.Series(11000001 + _skewed(rng, n_customers, n, 2.0)).astype(str),
+        "P_ID": "PD_" + pd.Series(21000001 + _skewed(rng, n_products, n, 2.5)).astype(str),
+        "Order_Date": _dates(rng, n),
+        "Order_Time": pd.Series(seconds // 3600).map("{:02d}".format) + ":"
+                      + pd.Series(seconds // 60 % 60).map("{:02d}".format) + ":"
+                      + pd.Series(seconds % 60).map("{:02d}".format),
+        "Qty": rng.integers(1, 11, n), "Coupon": coupon, "DP_ID": _pick(rng, DELIVERY["DP_ID"], n),
+        "Discount": discount,
+    })
+
+
+def _order_refs(rng, n_orders, size):
+    return "OR_" + pd.Series(31000001 + rng.integers(0, n_orders, size)).astype(str)
+
+
+def ratings(rng, start, n, n_orders):
+    return pd.DataFrame({
+        "R_ID": _ids("RT_", 101000001 + start, n), "Or_ID": _order_refs(rng, n_orders, n),
+        "Prod_Rating": rng.integers(1, 6, n), "Delivery_Service_Rating": rng.integers(1, 6, n),
+    })
+
+
+def returns(rng, start, n, n_orders):
+    return pd.DataFrame({
+        "RT_ID": _ids("RR_", 301000001 + start, n), "Or_ID": _order_refs(rng, n_orders, n),
+        "Reason": _pick(rng, REASONS, n), "Return_Refund": _pick(rng, ["Approved", "Rejected"], n),
+        "Dates": _dates(rng, n),
+    })
+
+
+def transactions(rng, start, n, n_orders):
+    return pd.DataFrame({
+        "Tr_ID": _ids("TR_", 41000001 + start, n), "Or_ID": _order_refs(rng, n_orders, n),
+        "Transaction_Mode": _pick(rng, MODES, n), "Reward": _pick(rng, ["Yes", "No"], n),
+    })
+
+
+def _write_chunked(path, make, total, chunk_rows):
+    for start in range(0, total, chunk_rows):
+        df = make(start, min(chunk_rows, total - start))
+        df.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+
+def generate(out_dir, n_orders, n_customers=None, n_products=None, return_rate=0.2,
+             seed=0, chunk_rows=1_000_000):
+    """Write the seven CSVs for `n_orders` orders into `out_dir`."""
+    n_customers = n_customers or max(n_orders, 1000)
+    n_products = n_products or max(min(n_orders, 200_000), 1000)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    _write_chunked(out / "customer.csv", lambda s, n: customers(rng, n), n_customers, chunk_rows)
+    _write_chunked(out / "products.csv", lambda s, n: products(rng, n), n_products, chunk_rows)
+    DELIVERY.to_csv(out / "delivery.csv", index=False)
+    _write_chunked(out / "orders.csv",
+                   lambda s, n: orders(rng, s, n, n_customers, n_products), n_orders, chunk_rows)
+    _write_chunked(out / "ratings.csv", lambda s, n: ratings(rng, s, n, n_orders), n_orders, chunk_rows)
+    _write_chunked(out / "returns.csv", lambda s, n: returns(rng, s, n, n_orders),
+                   int(n_orders * return_rate), chunk_rows)
+    _write_chunked(out / "transaction.csv", lambda s, n: transactions(rng, s, n, n_orders),
+                   n_orders, chunk_rows)
+    return out
+
+
+def parse_scale(text):
+    """'10k' -> 10_000, '1m' -> 1_000_000, '2500' -> 2500."""
+    text = text.lower()
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic AJIO CSV exports.")
+    parser.add_argument("--orders", type=parse_scale, default="10k", help="e.g. 10k, 1m, 10m")
+    parser.add_argument("--customers", type=parse_scale)
+    parser.add_argument("--products", type=parse_scale)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="output directory (default bench_data/<orders>)")
+    args = parser.parse_args()
+
+    out = args.out or f"bench_data/{args.orders}"
+    t0 = time.perf_counter()
+    generate(out, args.orders, args.customers, args.products, seed=args.seed)
+    print(f"{args.orders:,} orders written to {out} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
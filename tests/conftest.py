@@ -0,0 +1,25 @@
+"""Shared fixtures: a small synthetic data directory and its cube."""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cube  # noqa: E402
+import fact  # noqa: E402
+import ingest  # noqa: E402
+import synthetic  # noqa: E402
+
+ORDERS = 3000
+
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory):
+    return synthetic.generate(tmp_path_factory.mktemp("data"), ORDERS, seed=0)
+
+
+@pytest.fixture(scope="session")
+def reference(data_dir):
+    """The cube built in memory from the whole fact table, as the dashboard does."""
+    return cube.build_cube(fact.build_fact_table(ingest.read_csv_tables(data_dir)))
@@ -0,0 +1,18 @@
+import pytest
+
+import analytics
+import backends
+
+
+def test_duckdb_matches_pandas(data_dir, reference):
+    pytest.importorskip("duckdb")
+    assert backends.check_parity(reference, backends.DuckDBBackend(data_dir), trials=20) == []
+
+
+def test_reversed_month_range_selects_nothing(reference):
+    months = [m for m in reference.options("Month") if m != "NaT"]
+    spec = analytics.FilterSpec(start_month=months[-1], end_month=months[0])
+    assert spec.months(reference.options("Month")) == [analytics.NO_MONTH]
+    assert reference.filter(months=spec.months(reference.options("Month"))).kpis()["total_orders"] == 0
+    # Open ranges still mean "every month".
+    assert analytics.FilterSpec().months(months) is None
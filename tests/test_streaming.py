@@ -0,0 +1,8 @@
+import backends
+import streaming
+
+
+def test_out_of_core_cube_matches_in_memory(data_dir, reference):
+    # Small chunks, so the fact table is built from several partitions.
+    result = streaming.build_cube(data_dir, chunk_rows=500)
+    assert backends.check_parity(reference, result, trials=20) == []
@@ -0,0 +1,146 @@
+"""Per-stage timing of one dashboard rerun.
+
+A ``Trace`` records a span per pipeline stage: wall time, rows in and out
+where the stage knows them, and the change in process resident memory. The
+spans are shown in the sidebar Performance panel and can be exported as JSON
+lines or in the Chrome trace-event format (open it in chrome://tracing or
+https://ui.perfetto.dev). A rerun slower than the threshold is logged with
+the filter combination that caused it.
+
+Usage:
+    python analytics.py --state Maharashtra --trace chrome > rerun.json
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+log = logging.getLogger("ajio.perf")
+
+DEFAULT_SLOW_MS = 1000.0
+
+try:
+    _PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 2**20
+except (AttributeError, ValueError, OSError):  # not a POSIX system
+    _PAGE_MB = None
+
+
+def rss_mb():
+    """Resident set size of this process in MB, or None where unavailable."""
+    if _PAGE_MB is None:
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def private_mb():
+    """Anonymous (not file-backed, so not shareable) resident memory in MB, or None."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+@dataclass
+class Span:
+    name: str
+    start: float           # seconds since the trace started
+    duration_ms: float = 0.0
+    rows_in: int = None
+    rows_out: int = None
+    mem_delta_mb: float = None
+
+
+class Trace:
+    """Spans of one rerun, in the order the stages started."""
+
+    def __init__(self, label="rerun"):
+        self.label = label
+        self.spans = []
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._total_ms = None
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Time the enclosed block; set ``rows_out`` on the yielded span."""
+        mem = rss_mb()
+        span = Span(name, time.perf_counter() - self._t0, rows_in=rows_in)
+        self.spans.append(span)
+        try:
+            yield span
+        finally:
+            span.duration_ms = (time.perf_counter() - self._t0 - span.start) * 1000
+            after = rss_mb()
+            if mem is not None and after is not None:
+                span.mem_delta_mb = after - mem
+
+    @property
+    def total_ms(self):
+        if self._total_ms is not None:
+            return self._total_ms
+        return (time.perf_counter() - self._t0) * 1000
+
+    def finish(self):
+        """Stop the clock: ``total_ms`` no longer grows after this."""
+        if self._total_ms is None:
+            self._total_ms = self.total_ms
+        return self
+
+    def records(self):
+        return [{"trace": self.label, "started_at": self.started_at, **asdict(span)}
+                for span in self.spans]
+
+    def to_jsonl(self):
+        return "".join(json.dumps(record) + "\n" for record in self.records())
+
+    def chrome_events(self):
+        """Chrome trace events: one complete ("X") event per span."""
+        pid, tid = os.getpid(), threading.get_ident()
+        return [{
+            "name": span.name, "cat": self.label, "ph": "X", "pid": pid, "tid": tid,
+            "ts": (self.started_at + span.start) * 1e6, "dur": span.duration_ms * 1000,
+            "args": {k: v for k, v in [("rows_in", span.rows_in), ("rows_out", span.rows_out),
+                                       ("mem_delta_mb", span.mem_delta_mb)] if v is not None},
+        } for span in self.spans]
+
+    def to_chrome(self):
+        return to_chrome([self])
+
+    def check_slow(self, threshold_ms, context):
+        """Log a warning naming `context` (e.g. the filters) if the rerun was slow."""
+        total = self.total_ms
+        if total <= threshold_ms:
+            return False
+        slowest = max(self.spans, key=lambda span: span.duration_ms, default=None)
+        log.warning("slow %s: %.0f ms (threshold %.0f ms), slowest stage %s %.0f ms, filters %s",
+                    self.label, total, threshold_ms, slowest.name if slowest else "-",
+                    slowest.duration_ms if slowest else 0, context)
+        return True
+
+
+def to_chrome(traces):
+    """Chrome trace-event JSON of several traces, e.g. the fragments of one page."""
+    events = [event for trace in traces for event in trace.chrome_events()]
+    return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+
+
+class NullTrace:
+    """Stand-in when nothing is being traced."""
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        yield Span(name, 0.0)
+
+
+NULL_TRACE = NullTrace()